@@ -0,0 +1,137 @@
+"""
+Measures the EPG and channel list exports against the local fixture server,
+ without Kodi and without an account.
+
+Usage:
+    python benchmarks/export_benchmark.py [--export epg|channels]
+        [--channels 150] [--days 7] [--days-back 1] [--latency 50]
+        [--guide-cache] [--set setting=value ...] [--verbose]
+
+Reports the wall time, the number of API requests, the bytes received,
+ the peak RSS of the process and the size of the exported file.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+from time import perf_counter, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON = os.path.join(HERE, "..", "plugin.video.notyet")
+sys.path[:0] = [os.path.join(HERE, "stubs"), ADDON]
+
+import xbmc  # noqa: E402
+import xbmcaddon  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+DAY = 24 * 60 * 60
+
+
+def peak_rss() -> int:
+    """
+    :return: The peak resident set size of the process in bytes
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def configure(args: argparse.Namespace, workdir: str) -> None:
+    xbmcaddon.load_defaults(os.path.join(ADDON, "resources", "settings.xml"))
+    xbmcaddon.profile = os.path.join(workdir, "profile")
+    os.makedirs(xbmcaddon.profile)
+    xbmcaddon.settings.update(
+        {
+            "username": "benchmark",
+            "password": "benchmark",
+            "devicekey": "benchmark",
+            "channelexportpath": os.path.join(workdir, "export"),
+            "epgnotifoncompletion": "false",
+        }
+    )
+    for setting in args.set:
+        key, _, value = setting.partition("=")
+        xbmcaddon.settings[key] = value
+    xbmc.verbose = args.verbose
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--export", choices=("epg", "channels"), default="epg")
+    parser.add_argument("--channels", type=int, default=150)
+    parser.add_argument("--days", type=int, default=7, help="days ahead")
+    parser.add_argument("--days-back", type=int, default=1, help="days back")
+    parser.add_argument(
+        "--latency", type=float, default=50, help="server latency in ms"
+    )
+    parser.add_argument(
+        "--guide-cache",
+        action="store_true",
+        help="export twice through the service's guide cache, measure the second",
+    )
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE")
+    parser.add_argument("--verbose", action="store_true", help="print the addon log")
+    args = parser.parse_args()
+
+    now = int(time()) // 3600 * 3600
+    from_time = now - args.days_back * DAY
+    to_time = now + args.days * DAY
+    with tempfile.TemporaryDirectory() as workdir, FixtureServer(
+        args.channels,
+        from_time - DAY,
+        (args.days_back + args.days + 2) * DAY,
+        args.latency / 1000,
+    ) as server:
+        configure(args, workdir)
+
+        import export_data
+        from default import open_epg_store, token_store
+        from requests import Session
+        from resources.lib.yeti import static
+
+        static.get_ott_base = lambda: server.url
+        # a valid token, so the exports don't try to log in
+        token_store.update(kstoken="benchmark", ksexpiry=int(time()) + 365 * DAY)
+        addon = xbmcaddon.Addon()
+        session = Session()
+        store = None
+        if args.export == "epg":
+            path = export_data.get_path(addon, is_epg=True)
+            guide_cache = None
+            if args.guide_cache:
+                store = open_epg_store(addon)
+                guide_cache = export_data.GuideCache(store)
+                export_data.export_epg(
+                    addon, session, from_time, to_time, guide_cache=guide_cache
+                )
+            run = lambda: export_data.export_epg(
+                addon, session, from_time, to_time, guide_cache=guide_cache
+            )
+        else:
+            path = export_data.get_path(addon)
+            run = lambda: export_data.export_channel_list(addon, session)
+
+        requests, received = server.requests, server.sent
+        started = perf_counter()
+        run()
+        elapsed = perf_counter() - started
+        requests, received = server.requests - requests, server.sent - received
+        if store is not None:
+            store.close()
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    print(f"export:       {args.export}")
+    print(f"channels:     {args.channels}")
+    print(f"window:       {args.days_back} days back, {args.days} days ahead")
+    print(f"latency:      {args.latency:g} ms")
+    print(f"wall time:    {elapsed:.2f} s")
+    print(f"requests:     {requests}")
+    print(f"received:     {received / 1024 / 1024:.1f} MiB")
+    print(f"peak RSS:     {peak_rss() / 1024 / 1024:.1f} MiB")
+    print(f"output size:  {size / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
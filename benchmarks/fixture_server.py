@@ -0,0 +1,249 @@
+"""
+Local HTTP server standing in for the OTT backend during the benchmarks.
+It answers asset/action/list searches for the channel list and the program
+ guide with responses built from the recorded objects in fixtures/, at any
+ number of channels and days. Every other endpoint returns an empty result.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from typing import Dict, List, Optional, Tuple
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# program lengths in minutes, cycled with a per channel offset
+DURATIONS = (20, 25, 30, 45, 60, 90, 110, 15, 50, 30)
+RANGE_RE = re.compile(r"start_date >= '(-?\d+)' end_date\s*<= '(-?\d+)'")
+SLICE_RE = re.compile(
+    r"start_date >= '(-?\d+)' start_date < '(-?\d+)' end_date\s*<= '(-?\d+)'"
+)
+ASSET_RE = re.compile(r"linear_media_id:'(\d+)'")
+
+
+def _load(name: str) -> dict:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Guide:
+    """
+    Deterministic program guide of the fixture channels.
+    """
+
+    first_channel_id = 1000
+
+    def __init__(self, channels: int, origin: int, length: int) -> None:
+        """
+        :param channels: The number of channels
+        :param origin: Unix timestamp of the start of the schedule
+        :param length: Length of the schedule in seconds
+        """
+        self.channel_template = _load("channel.json")
+        self.programme_template = _load("programme.json")
+        self.channel_ids = [self.first_channel_id + idx for idx in range(channels)]
+        self.starts: Dict[int, List[int]] = {}
+        self.ends: Dict[int, List[int]] = {}
+        for offset, channel_id in enumerate(self.channel_ids):
+            starts, ends = [], []
+            time = origin
+            idx = offset
+            while time < origin + length:
+                starts.append(time)
+                time += DURATIONS[idx % len(DURATIONS)] * 60
+                ends.append(time)
+                idx += 1
+            self.starts[channel_id] = starts
+            self.ends[channel_id] = ends
+
+    def channels(self) -> List[dict]:
+        objects = []
+        for idx, channel_id in enumerate(self.channel_ids):
+            channel = dict(self.channel_template)
+            channel["id"] = channel_id
+            channel["name"] = f"Channel {idx + 1} "
+            objects.append(channel)
+        return objects
+
+    def search(
+        self,
+        channel_ids: List[int],
+        ranges: List[Tuple[int, Optional[int], int]],
+    ) -> List[Tuple[int, int, int]]:
+        """
+        :param channel_ids: The linear asset ids to search in
+        :param ranges: list of (start from, start before, end until) tuples
+        :return: list of (start date, channel id, index) tuples ordered by start date
+        """
+        found = set()
+        for channel_id in channel_ids:
+            starts = self.starts.get(channel_id)
+            if starts is None:
+                continue
+            ends = self.ends[channel_id]
+            for start_from, start_before, end_until in ranges:
+                first = bisect_left(starts, start_from)
+                last = bisect_right(ends, end_until)
+                if start_before is not None:
+                    last = min(last, bisect_left(starts, start_before))
+                for idx in range(first, last):
+                    found.add((starts[idx], channel_id, idx))
+        return sorted(found)
+
+    def programme(self, channel_id: int, idx: int) -> dict:
+        programme = dict(self.programme_template)
+        programme_id = channel_id * 1000000 + idx
+        programme["id"] = programme_id
+        programme["name"] = f"Programme {idx}"
+        programme["startDate"] = self.starts[channel_id][idx]
+        programme["endDate"] = self.ends[channel_id][idx]
+        programme["linearAssetId"] = channel_id
+        programme["epgChannelId"] = channel_id
+        programme["epgId"] = str(programme_id)
+        programme["enableCdvr"] = idx % 6 != 0
+        metas = dict(programme["metas"])
+        if idx % 5 == 0:
+            # a movie
+            metas["ContentType"] = {
+                "objectType": "KalturaStringValue",
+                "value": "Movie",
+            }
+            for key in ("SeasonNumber", "EpisodeNumber", "EpisodeName"):
+                metas.pop(key, None)
+        else:
+            metas["EpisodeNumber"] = {
+                "objectType": "KalturaLongValue",
+                "value": idx % 24 + 1,
+            }
+        programme["metas"] = metas
+        return programme
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    guide: Guide = None
+    latency = 0.0
+    requests = None
+    sent = None
+    # the results of the last searches, so paging doesn't search again
+    results: Dict[str, list] = {}
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.requests.get_lock():
+            self.requests.value += 1
+        if self.latency:
+            sleep(self.latency)
+        result = {"objectType": "KalturaAssetListResponse", "totalCount": 0}
+        if self.path.split("?")[0].endswith("/asset/action/list"):
+            data = json.loads(body)
+            ksql = data.get("filter", {}).get("kSql", "")
+            pager = data.get("pager", {})
+            objects = self.find(ksql)
+            page_size = pager.get("pageSize", 500)
+            page_idx = pager.get("pageIndex", 1)
+            page = objects[(page_idx - 1) * page_size : page_idx * page_size]
+            if objects:
+                result["totalCount"] = len(objects)
+                result["objects"] = [
+                    item if isinstance(item, dict) else self.guide.programme(*item[1:])
+                    for item in page
+                ]
+        response = json.dumps({"executionTime": 0.01, "result": result}).encode()
+        with self.sent.get_lock():
+            self.sent.value += len(response)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def find(self, ksql: str) -> list:
+        if "asset_type='613'" in ksql:
+            return self.guide.channels()
+        if "asset_type='epg'" not in ksql:
+            return []
+        objects = self.results.get(ksql)
+        if objects is None:
+            ranges = [
+                (int(start), None, int(end)) for start, end in RANGE_RE.findall(ksql)
+            ]
+            ranges += [
+                (int(start), int(before), int(until))
+                for start, before, until in SLICE_RE.findall(ksql)
+            ]
+            channel_ids = [int(channel_id) for channel_id in ASSET_RE.findall(ksql)]
+            objects = self.guide.search(channel_ids, ranges)
+            if len(self.results) > 64:
+                self.results.clear()
+            self.results[ksql] = objects
+        return objects
+
+
+def _serve(
+    ready, requests, sent, channels: int, origin: int, length: int, latency: float
+) -> None:
+    Handler.guide = Guide(channels, origin, length)
+    Handler.latency = latency
+    Handler.requests = requests
+    Handler.sent = sent
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class FixtureServer:
+    """
+    Runs the fixture server in a separate process, so neither its CPU time
+     nor its memory shows up in the measurements of the benchmark.
+
+    Usage:
+        with FixtureServer(150, origin, 9 * 86400) as server:
+            ... requests to server.url ...
+            print(server.requests)
+    """
+
+    def __init__(
+        self, channels: int, origin: int, length: int, latency: float = 0.0
+    ) -> None:
+        """
+        :param channels: The number of channels
+        :param origin: Unix timestamp of the start of the schedule
+        :param length: Length of the schedule in seconds
+        :param latency: Seconds to wait before answering a request
+        """
+        self.args = (channels, origin, length, latency)
+        self.process = None
+        self.url = ""
+        self._requests = multiprocessing.Value("l", 0)
+        self._sent = multiprocessing.Value("l", 0)
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value
+
+    @property
+    def sent(self) -> int:
+        return self._sent.value
+
+    def __enter__(self) -> "FixtureServer":
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(ready, self._requests, self._sent, *self.args),
+            daemon=True,
+        )
+        self.process.start()
+        self.url = f"http://127.0.0.1:{ready.get(timeout=60)}/"
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.process.terminate()
+        self.process.join()
@@ -0,0 +1,124 @@
+"""
+Measures the Kodi side of a listing: the recordings listing is built from
+ recorded objects in memory, without the API, once reading every setting
+ and string from the addon and once through the settings snapshot.
+
+Usage:
+    python benchmarks/listing_benchmark.py [--items 200] [--call-cost 200]
+        [--repeat 5]
+
+Every call into the addon costs --call-cost microseconds of busy waiting,
+ standing in for the round trip into Kodi. Reports the best wall time of
+ the repeats and the number of calls into the addon.
+"""
+
+import argparse
+import json
+import os
+import sys
+from time import perf_counter, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON = os.path.join(HERE, "..", "plugin.video.notyet")
+sys.path[:0] = [os.path.join(HERE, "stubs"), ADDON]
+
+import xbmcaddon  # noqa: E402
+
+DAY = 24 * 60 * 60
+
+
+class KodiAddon:
+    """
+    Addon whose every call waits like a call into Kodi and is counted.
+    """
+
+    def __init__(self, cost: float) -> None:
+        """
+        :param cost: The cost of a call in seconds
+        """
+        self.addon = xbmcaddon.Addon()
+        self.cost = cost
+        self.calls = 0
+
+    def __getattr__(self, name: str):
+        method = getattr(self.addon, name)
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            until = perf_counter() + self.cost
+            while perf_counter() < until:
+                pass
+            return method(*args, **kwargs)
+
+        return call
+
+
+def recordings(count: int) -> list:
+    """
+    :param count: The number of recordings
+    :return: Recording objects built from the programme fixture
+    """
+    with open(os.path.join(HERE, "fixtures", "programme.json"), encoding="utf-8") as f:
+        template = json.load(f)
+    now = int(time())
+    items = []
+    for idx in range(count):
+        item = dict(template)
+        item.update(
+            {
+                "id": template["id"] + idx,
+                "recordingId": 5000 + idx,
+                "recordingType": "SINGLE",
+                "startDate": now - (idx + 1) * 3600,
+                "endDate": now - idx * 3600,
+                "viewableUntilDate": now + 30 * DAY,
+            }
+        )
+        items.append(item)
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument(
+        "--call-cost", type=float, default=200, help="cost of a call in µs"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    xbmcaddon.load_defaults(os.path.join(ADDON, "resources", "settings.xml"))
+    xbmcaddon.settings.update({"kstoken": "benchmark"})
+    # the plugin reads its url and handle from the arguments
+    sys.argv = ["plugin://plugin.video.notyet/", "1", "?action=recordings"]
+
+    import default
+    from resources.lib.utils.settings_snapshot import SettingsSnapshot
+
+    items = recordings(args.items)
+    default.media_list.iter_recording_groups = lambda *args, **kwargs: iter(items)
+
+    results = {}
+    for mode in ("addon", "snapshot"):
+        best, calls = None, 0
+        for _ in range(args.repeat):
+            kodi_addon = KodiAddon(args.call_cost / 1_000_000)
+            # a new snapshot per run, like a new plugin invocation
+            default.addon = (
+                SettingsSnapshot(kodi_addon) if mode == "snapshot" else kodi_addon
+            )
+            started = perf_counter()
+            default.recording_listing(None)
+            elapsed = perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            calls = kodi_addon.calls
+        results[mode] = best
+        print(f"{mode + ':':<14}{best * 1000:8.1f} ms, {calls} calls into Kodi")
+
+    print(f"items:        {args.items}")
+    print(f"call cost:    {args.call_cost:g} µs")
+    print(f"speedup:      {results['addon'] / results['snapshot']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
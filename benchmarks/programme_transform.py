@@ -0,0 +1,177 @@
+"""
+Compares the CPU time of the programme transform used by the EPG export
+ with the inline per-programme transform it replaced.
+
+Usage:
+    python benchmarks/programme_transform.py [programme count] [rounds]
+"""
+
+import os
+import sys
+from datetime import datetime
+from time import process_time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "plugin.video.notyet"
+    ),
+)
+
+from resources.lib.utils.xmltv import ProgrammeConverter  # noqa: E402
+
+CHANNELS = 150
+START = 1700000000
+
+
+def make_guide(count: int) -> dict:
+    """
+    Generates program objects shaped like the API's search results.
+
+    :param count: The number of programs
+    :return: A dict where the key is the channel id and the value is
+     the list of its programs
+    """
+    per_channel = max(1, count // CHANNELS)
+    guide = {}
+    for channel in range(CHANNELS):
+        channel_id = 1000 + channel
+        programs = []
+        start = START
+        for idx in range(per_channel):
+            end = start + 600 + (idx * 37 + channel * 11) % 5400
+            program = {
+                "id": channel_id * 100000 + idx,
+                "name": f"Program {idx}",
+                "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+                "startDate": start,
+                "endDate": end,
+                "enableCdvr": idx % 4 != 0,
+                "linearAssetId": channel_id,
+                "images": [
+                    {"ratio": "2x3", "url": f"https://img.example/{idx}/2x3"},
+                    {"ratio": "16x9", "url": f"https://img.example/{idx}/16x9"},
+                ],
+                "metas": {
+                    "ContentType": {"value": "Series" if idx % 2 else "Movie"},
+                    "Year": {"value": 1990 + idx % 30},
+                    "SeasonNumber": {"value": 1 + idx % 5},
+                    "EpisodeNumber": {"value": 1 + idx % 20},
+                    "EpisodeName": {"value": f"Episode {idx}"},
+                    "Genre": {"value": "Drama"},
+                },
+            }
+            if idx % 7 == 0:
+                del program["images"]
+                del program["metas"]["SeasonNumber"]
+            programs.append(program)
+            start = end
+        guide[channel_id] = programs
+    return guide
+
+
+def unix_to_epg_time(unix_time: int) -> str:
+    return datetime.utcfromtimestamp(unix_time).strftime("%Y%m%d%H%M%S %z")
+
+
+def legacy_convert(channel_id: int, epg_data: list, epg_in_description: bool) -> list:
+    """
+    The transform as it used to be inlined in export_epg.
+    """
+    programmes = []
+    for epg in epg_data:
+        program_start_date = unix_to_epg_time(epg.get("startDate", 0))
+        program_end_date = unix_to_epg_time(epg.get("endDate", 0))
+        program_name = epg.get("name", "")
+        program_id = epg.get("id")
+        program_enable_cdvr = epg.get("enableCdvr", True)
+        if epg_in_description and program_id:
+            program_description = f"({'' if program_enable_cdvr else '!'}{program_id}) {epg.get('description', '')}"
+        else:
+            program_description = epg.get("description", "")
+        images = epg.get("images")
+        program_image = ""
+        if images:
+            program_image = (
+                next(
+                    (image for image in images if image.get("ratio") == "16x9"),
+                    images[0],
+                )["url"]
+                + "/width/240"
+            )
+        program_metas = epg.get("metas", {})
+        program_content_type = program_metas.get("ContentType", {}).get(
+            "value", "Unknown"
+        )
+        program_year = program_metas.get("Year", {}).get("value")
+        program = {
+            "@start": program_start_date,
+            "@stop": program_end_date,
+            "@channel": channel_id,
+            "title": {"@lang": "hu", "#text": program_name},
+            "desc": {"@lang": "hu", "#text": program_description},
+            "icon": {"@src": program_image},
+            "category": program_content_type,
+        }
+        if program_year:
+            program["date"] = program_year
+        program_season = program_metas.get("SeasonNumber", {}).get("value")
+        program_episode = program_metas.get("EpisodeNumber", {}).get("value")
+        if program_season and program_episode:
+            program["episode-num"] = {
+                "@system": "xmltv_ns",
+                "#text": f"{int(program_season) - 1}.{int(program_episode) - 1}.",
+            }
+        program_episode_name = program_metas.get("EpisodeName", {}).get("value")
+        if program_episode_name:
+            program["sub-title"] = {"@lang": "hu", "#text": program_episode_name}
+        if program_enable_cdvr:
+            program["@catchup-id"] = (
+                f"plugin://plugin.video.notyet/?action=catchup&id={program_id}&start={epg.get('startDate', 0)}&end={epg.get('endDate', 0)}"
+            )
+        programmes.append(program)
+    return programmes
+
+
+def run_legacy(guide: dict) -> list:
+    return [
+        legacy_convert(channel, programs, True) for channel, programs in guide.items()
+    ]
+
+
+def run_converter(guide: dict) -> list:
+    # a new converter per run, so the memoized timestamps start out empty
+    converter = ProgrammeConverter(True)
+    return [converter.convert(channel, programs) for channel, programs in guide.items()]
+
+
+def measure(func, guide: dict, rounds: int) -> float:
+    """
+    :return: The best CPU time of the rounds in seconds
+    """
+    best = None
+    for _ in range(rounds):
+        started = process_time()
+        func(guide)
+        elapsed = process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    guide = make_guide(count)
+    total = sum(len(programs) for programs in guide.values())
+    if run_legacy(guide) != run_converter(guide):
+        sys.exit("The converter output differs from the legacy transform")
+    legacy = measure(run_legacy, guide, rounds)
+    converter = measure(run_converter, guide, rounds)
+    print(f"programmes:  {total}")
+    print(f"legacy:      {legacy * 1000:.1f} ms")
+    print(f"converter:   {converter * 1000:.1f} ms")
+    print(f"speedup:     {legacy / converter:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Minimal stand-in for script.module.inputstreamhelper."""
+
+
+class Helper:
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def check_inputstream(self) -> bool:
+        return True
@@ -0,0 +1,44 @@
+"""Minimal stand-in for Kodi's xbmc module, enough to run the exports."""
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+LOGFATAL = 4
+
+# set to True to print the log messages of the addon
+verbose = False
+
+
+def log(msg: str, level: int = LOGDEBUG) -> None:
+    if verbose:
+        print(msg)
+
+
+def sleep(time: int) -> None:
+    pass
+
+
+def executebuiltin(function: str, wait: bool = False) -> None:
+    pass
+
+
+def executeJSONRPC(jsonrpccommand: str) -> str:
+    return '{"jsonrpc": "2.0", "id": 1, "result": {}}'
+
+
+def getInfoLabel(cLine: str) -> str:
+    return ""
+
+
+class Monitor:
+    def abortRequested(self) -> bool:
+        return False
+
+    def waitForAbort(self, timeout: float = -1) -> bool:
+        return False
+
+
+class Player:
+    def isPlaying(self) -> bool:
+        return False
@@ -0,0 +1,66 @@
+"""
+Minimal stand-in for Kodi's xbmcaddon module. Settings are kept in the
+ module level `settings` dict, the profile folder in `profile`.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+settings = {}
+profile = ""
+info = {"id": "plugin.video.notyet", "name": "NotYet", "version": "0.0.0"}
+
+
+def load_defaults(path: str) -> None:
+    """
+    Loads the default values of an addon's settings.xml into `settings`.
+
+    :param path: Path of the settings.xml file
+    :return: None
+    """
+    for setting in ET.parse(path).iter("setting"):
+        default = setting.find("default")
+        if setting.get("id") and default is not None:
+            settings[setting.get("id")] = default.text or ""
+
+
+class Addon:
+    def __init__(self, id: str = None) -> None:
+        pass
+
+    def getAddonInfo(self, id: str) -> str:
+        if id == "profile":
+            return profile
+        if id == "path":
+            return os.getcwd()
+        return info.get(id, "")
+
+    def getLocalizedString(self, id: int) -> str:
+        return f"string {id}"
+
+    def getSetting(self, id: str) -> str:
+        return str(settings.get(id, ""))
+
+    def getSettingBool(self, id: str) -> bool:
+        return str(settings.get(id, "")).lower() == "true"
+
+    def getSettingInt(self, id: str) -> int:
+        return int(settings.get(id) or 0)
+
+    def getSettingString(self, id: str) -> str:
+        return self.getSetting(id)
+
+    def setSetting(self, id: str, value: str) -> None:
+        settings[id] = value
+
+    def setSettingBool(self, id: str, value: bool) -> None:
+        settings[id] = "true" if value else "false"
+
+    def setSettingInt(self, id: str, value: int) -> None:
+        settings[id] = str(value)
+
+    def setSettingString(self, id: str, value: str) -> None:
+        settings[id] = value
+
+    def openSettings(self) -> None:
+        pass
@@ -0,0 +1,38 @@
+"""Minimal stand-in for Kodi's xbmcgui module, dialogs do nothing."""
+
+NOTIFICATION_INFO = "info"
+NOTIFICATION_WARNING = "warning"
+NOTIFICATION_ERROR = "error"
+
+
+class Dialog:
+    def notification(self, *args, **kwargs) -> None:
+        pass
+
+    def ok(self, *args, **kwargs) -> bool:
+        return True
+
+    def yesno(self, *args, **kwargs) -> bool:
+        return False
+
+
+class DialogProgress:
+    def create(self, *args, **kwargs) -> None:
+        pass
+
+    def update(self, *args, **kwargs) -> None:
+        pass
+
+    def iscanceled(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class ListItem:
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: None
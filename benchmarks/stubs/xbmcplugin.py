@@ -0,0 +1,17 @@
+"""Minimal stand-in for Kodi's xbmcplugin module."""
+
+
+def addDirectoryItem(*args, **kwargs) -> bool:
+    return True
+
+
+def endOfDirectory(*args, **kwargs) -> None:
+    pass
+
+
+def setContent(*args, **kwargs) -> None:
+    pass
+
+
+def setResolvedUrl(*args, **kwargs) -> None:
+    pass
@@ -0,0 +1,16 @@
+"""Minimal stand-in for Kodi's xbmcvfs module, backed by the local file system."""
+
+import os
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(path)
+
+
+def mkdirs(path: str) -> bool:
+    os.makedirs(path, exist_ok=True)
+    return True
+
+
+def translatePath(path: str) -> str:
+    return path
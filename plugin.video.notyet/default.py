@@ -1,7 +1,9 @@
+import os
 from json import dumps
 from random import choice
 from sys import argv
 from time import time
+from typing import Callable, Optional, Tuple
 from urllib.parse import parse_qsl, quote, urlencode
 from uuid import uuid4
 
@@ -10,15 +12,41 @@ import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcplugin
-from requests import Session
+import xbmcvfs
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
 from resources.lib.utils import gen_desktop_udid
 from resources.lib.utils import static as utils_static
 from resources.lib.utils import unix_to_date
-from resources.lib.yeti import household, login, media_list, misc, playback
+from resources.lib.utils.epg_store import EPGStore
+from resources.lib.utils.file_lock import FileLock
+from resources.lib.utils.reference_cache import ReferenceCache
+from resources.lib.utils.response_cache import ResponseCache
+from resources.lib.utils.settings_snapshot import SettingsSnapshot
+from resources.lib.utils.token_store import TokenStore
+from resources.lib.yeti import login, media_list, misc, playback
+from resources.lib.yeti.client import SessionExpired, YetiError
 from resources.lib.yeti.static import drm_client_tag, get_drm_referrer
 
-addon = xbmcaddon.Addon()
+# settings and strings are read from Kodi only once per invocation
+addon = SettingsSnapshot(xbmcaddon.Addon())
 addon_name = addon.getAddonInfo("name")
+# session state (tokens and their expiry), kept out of the settings
+# so logging in doesn't rewrite them over and over
+token_store = TokenStore(
+    os.path.join(xbmcvfs.translatePath(addon.getAddonInfo("profile")), "tokens.json")
+)
+# settings the tokens were stored in by older versions
+legacy_token_settings = (
+    "oauthaccesstoken",
+    "oauthrefreshtoken",
+    "oauthexpires",
+    "kstoken",
+    "ksrefreshtoken",
+    "ksexpiry",
+)
+# cache of the listings, opened by the router
+response_cache = None
 
 
 def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs):
@@ -87,7 +115,12 @@ def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs):
         pass  # if it's a local dir, no need for it
     ctx_menu = []
     if kwargs.get("refresh"):
-        ctx_menu.append((addon.getLocalizedString(30026), "Container.Refresh"))
+        ctx_menu.append(
+            (
+                addon.getLocalizedString(30026),
+                f"RunPlugin({plugin_prefix}?action=refresh)",
+            )
+        )
     if kwargs.get("ctx_menu"):
         ctx_menu.extend(kwargs["ctx_menu"])
     item.addContextMenuItems(ctx_menu)
@@ -96,13 +129,10 @@ def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs):
 
 def authenticate(session: Session, addon_from_thread: xbmcaddon.Addon = None) -> None:
     """
-    Method to be called to check authentication state. If not authenticated, it will
-    handle the entire authentication process including OAuth login and KS token retrieval as
-    well as storing the tokens in the addon settings and device registration.
-    If already authenticated, it will check if the KS token is still valid and if not, it will
-    retrieve a new one.
-
-    OAuth token refresh is not implemented yet.
+    Method to be called to check authentication state. If the KS token is missing
+    or expired, it logs in (see login_session).
+    Only one process (or thread) logs in at a time, the others wait for it
+    and use the tokens it obtained.
 
     :param session: The requests session to use for the authentication.
     :return: None
@@ -113,147 +143,184 @@ def authenticate(session: Session, addon_from_thread: xbmcaddon.Addon = None) ->
         [addon_local.getSetting("username"), addon_local.getSetting("password")]
     ):
         return
-    if not addon_local.getSetting("devicekey"):
-        device_id = gen_desktop_udid()
-        addon_local.setSetting("devicekey", device_id)
-    ks_expiry = addon_local.getSetting("ksexpiry")
-
-    if ks_expiry and int(ks_expiry) > int(time()):
+    migrate_legacy_tokens(addon_local)
+    if token_store.get("ksexpiry", 0) > int(time()):
         return  # KS token is valid so no need to reauthenticate
+    # if the lock can't be acquired in time, the login is done anyway
+    with open_auth_lock(addon_local):
+        if token_store.get("ksexpiry", 0) > int(time()):
+            return  # logged in by someone else while we waited
+        error = login_session(session, addon_local)
+    # shown once the lock is released, so the others don't wait for the user
+    if error:
+        xbmcgui.Dialog().ok(addon_local.getAddonInfo("name"), error)
+
+
+def login_session(
+    session: Session, addon_from_thread: xbmcaddon.Addon = None
+) -> Optional[str]:
+    """
+    Handles the entire authentication process including OAuth login and KS token
+    retrieval as well as storing the tokens in the token store and device registration.
+    If the KS token expired, it will refresh it instead.
+    The OAuth access token is obtained with the stored refresh token if possible,
+    the full OAuth login is only done if there is none or it's rejected.
+    Should be called through authenticate, which makes sure only one login
+    runs at a time and shows the returned error.
+
+    :param session: The requests session to use for the authentication.
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: The error message if the login failed, None otherwise
+    """
+    addon_local = addon_from_thread or addon
+
+    if not addon_local.getSetting("devicekey"):
+        addon_local.setSetting("devicekey", gen_desktop_udid())
+    ks_expiry = token_store.get("ksexpiry", 0)
     user_agent = addon_local.getSetting("useragent")
 
     # OAuth login
-    # NOTE: while we store the OAuth access token, there is
-    # no session renewal implemented yet
     current_time = int(time())
-    expires = addon_local.getSetting("oauthexpires")
+    expires = token_store.get("oauthexpires", 0)
     prog_dialog = xbmcgui.DialogProgress()
     prog_dialog.create(addon_local.getAddonInfo("name"))
-    # obtain new OAuth access token only if it expired and we don't
-    # have a ks token yet or if it doesn't exist
-    if not expires or (
-        (expires and int(expires) > current_time)
-        and not addon_local.getSetting("kstoken")
-    ):
+    # obtain new OAuth access token if we don't have a ks token yet
+    # or if it doesn't exist
+    # the new tokens are stored at once at the end
+    tokens = {}
+    if not expires or not token_store.get("kstoken"):
         prog_dialog.update(50, addon.getLocalizedString(30027))
+        oauth_params = {
+            "user_agent": user_agent,
+            "app_version": addon_local.getSetting("appversion"),
+            "client_tag": addon_local.getSetting("clienttag"),
+            "partner_id": addon_local.getSetting("partnerid"),
+            "platform": addon_local.getSetting("platform"),
+            "device_family": addon_local.getSetting("devicefamily"),
+            "device_brand": addon_local.getSetting("devicebrand"),
+            "firmware": addon_local.getSetting("firmware"),
+            "tv_pil_version": addon_local.getSetting("tvpilversion"),
+            "realm": addon_local.getSetting("realm"),
+        }
+        # the OAuth portal details rarely change, so they are stored
+        reference_cache = open_reference_cache(addon_local)
         try:
-            access_token, refresh_token, expires_in = login.login(
-                session,
-                addon_local.getSetting("devicekey"),
-                addon_local.getSetting("username"),
-                addon_local.getSetting("password"),
-                user_agent=user_agent,
-                app_version=addon_local.getSetting("appversion"),
-                client_tag=addon_local.getSetting("clienttag"),
-                partner_id=addon_local.getSetting("partnerid"),
-                platform=addon_local.getSetting("platform"),
-                device_family=addon_local.getSetting("devicefamily"),
-                device_brand=addon_local.getSetting("devicebrand"),
-                firmware=addon_local.getSetting("firmware"),
-                tv_pil_version=addon_local.getSetting("tvpilversion"),
-                realm=addon_local.getSetting("realm"),
+            auth_params = reference_cache.get(
+                "oauth",
+                lambda: login.get_auth_params(
+                    session, addon_local.getSetting("devicekey"), **oauth_params
+                ),
             )
+            access_token = None
+            refresh_token = token_store.get("oauthrefreshtoken")
+            if refresh_token:
+                try:
+                    access_token, refresh_token, expires_in = login.refresh_oauth_token(
+                        session,
+                        addon_local.getSetting("devicekey"),
+                        refresh_token,
+                        auth_params=auth_params,
+                        **oauth_params,
+                    )
+                except (login.OAuthRefreshFailed, RequestException) as e:
+                    xbmc.log(
+                        f"[{addon_name}] OAuth token refresh failed, logging in: {e}",
+                        xbmc.LOGINFO,
+                    )
+            if not access_token:
+                access_token, refresh_token, expires_in = login.login(
+                    session,
+                    addon_local.getSetting("devicekey"),
+                    addon_local.getSetting("username"),
+                    addon_local.getSetting("password"),
+                    auth_params=auth_params,
+                    **oauth_params,
+                )
         except login.LoginFailed as e:
-            dialog = xbmcgui.Dialog()
-            dialog.ok(addon_local.getAddonInfo("name"), str(e))
-            return
-        addon_local.setSetting("oauthaccesstoken", access_token)
-        addon_local.setSetting("oauthrefreshtoken", refresh_token)
-        addon_local.setSetting("oauthexpires", str(current_time + expires_in))
-    # KS login
-    # refresh KS token if it expired
-    if ks_expiry and int(ks_expiry) < current_time:
-        prog_dialog.update(85, addon_local.getLocalizedString(30028))
-        try:
-            ks_token, ks_refresh_token, ks_expiry = login.refresh_ks_token(
-                session,
-                addon_local.getSetting("kstoken"),
-                addon_local.getSetting("ksrefreshtoken"),
-                api_version=addon_local.getSetting("apiversion"),
-                client_tag=addon_local.getSetting("clienttag"),
-            )
-        except login.RefreshSessionFailed as e:
-            # invalid refresh token
-            if e.code == "500017":
-                clear_settings(True)
-                authenticate(session, addon_from_thread)
-                return
-            dialog = xbmcgui.Dialog()
-            dialog.ok(addon_local.getAddonInfo("name"), str(e))
-            return
-        addon_local.setSetting("kstoken", ks_token)
-        addon_local.setSetting("ksrefreshtoken", ks_refresh_token)
-        addon_local.setSetting("ksexpiry", str(ks_expiry))
-    # obtain new KS token if it doesn't exist
-    if not addon_local.getSetting("kstoken"):
-        prog_dialog.update(65, addon_local.getLocalizedString(30029))
-        # anonymous login
-        anon_ks_token, _, _ = login.anonymous_login(
-            session,
-            api_version=addon_local.getSetting("apiversion"),
-            client_tag=addon_local.getSetting("clienttag"),
-            partner_id=addon_local.getSetting("partnerid"),
+            # the stored details might be outdated
+            reference_cache.invalidate("oauth")
+            prog_dialog.close()
+            return str(e)
+        except AssertionError:
+            reference_cache.invalidate("oauth")
+            raise
+        tokens.update(
+            oauthaccesstoken=access_token,
+            oauthrefreshtoken=refresh_token,
+            oauthexpires=current_time + expires_in,
         )
-        prog_dialog.update(75, addon_local.getLocalizedString(30030))
-        # login using the OAuth access token and anonymous KS token
-        try:
-            ks_token, ks_refresh_token, ks_expiry = login.login_ott(
+    # KS login
+    try:
+        # refresh KS token if it expired
+        if ks_expiry and ks_expiry < current_time:
+            prog_dialog.update(85, addon_local.getLocalizedString(30028))
+            try:
+                refresh_ks_session(session, addon_local)
+            except login.RefreshSessionFailed as e:
+                # invalid refresh token, a new KS token is obtained
+                # with a refreshed OAuth access token
+                if e.code == "500017":
+                    token_store.update(
+                        kstoken=None, ksrefreshtoken=None, ksexpiry=None, **tokens
+                    )
+                    tokens = {}
+                    prog_dialog.close()
+                    return login_session(session, addon_from_thread)
+                prog_dialog.close()
+                return str(e)
+        # obtain new KS token if it doesn't exist
+        if not token_store.get("kstoken"):
+            prog_dialog.update(65, addon_local.getLocalizedString(30029))
+            # anonymous login
+            anon_ks_token, _, _ = login.anonymous_login(
                 session,
-                access_token,
-                anon_ks_token,
-                addon_local.getSetting("devicekey"),
                 api_version=addon_local.getSetting("apiversion"),
                 client_tag=addon_local.getSetting("clienttag"),
                 partner_id=addon_local.getSetting("partnerid"),
-                ott_password=addon_local.getSetting("ottpassword"),
-                ott_username=addon_local.getSetting("ottusername"),
-            )
-        except login.LoginFailed as e:
-            dialog = xbmcgui.Dialog()
-            dialog.ok(addon_local.getAddonInfo("name"), str(e))
-            return
-        prog_dialog.update(85, addon_local.getLocalizedString(30031))
-        # register device or get device id if already registered
-        try:
-            got_device_id = login.get_or_add_device_to_household(
-                session,
-                ks_token,
-                addon_local.getSetting("devicekey"),
-                name=addon_local.getSetting("devicenick"),
-                api_version=addon_local.getSetting("apiversion"),
-                client_tag=addon_local.getSetting("clienttag"),
-                device_brand=addon_local.getSetting("devicebrand"),
             )
-            assert got_device_id == device_id
-        except AssertionError:
-            dialog = xbmcgui.Dialog()
-            dialog.ok(
-                addon_local.getAddonInfo("name"), addon_local.getLocalizedString(30032)
+            prog_dialog.update(75, addon_local.getLocalizedString(30030))
+            # login using the OAuth access token and anonymous KS token
+            try:
+                ks_token, ks_refresh_token, ks_expiry = login.login_ott(
+                    session,
+                    access_token,
+                    anon_ks_token,
+                    addon_local.getSetting("devicekey"),
+                    api_version=addon_local.getSetting("apiversion"),
+                    client_tag=addon_local.getSetting("clienttag"),
+                    partner_id=addon_local.getSetting("partnerid"),
+                    ott_password=addon_local.getSetting("ottpassword"),
+                    ott_username=addon_local.getSetting("ottusername"),
+                )
+            except login.LoginFailed as e:
+                prog_dialog.close()
+                return str(e)
+            prog_dialog.update(85, addon_local.getLocalizedString(30031))
+            # register device or get device id if already registered
+            try:
+                got_device_id = login.get_or_add_device_to_household(
+                    session,
+                    ks_token,
+                    addon_local.getSetting("devicekey"),
+                    name=addon_local.getSetting("devicenick"),
+                    api_version=addon_local.getSetting("apiversion"),
+                    client_tag=addon_local.getSetting("clienttag"),
+                    device_brand=addon_local.getSetting("devicebrand"),
+                )
+                assert got_device_id == addon_local.getSetting("devicekey")
+            except AssertionError:
+                prog_dialog.close()
+                return addon_local.getLocalizedString(30032)
+            except login.AddHouseHoldDeviceError as e:
+                prog_dialog.close()
+                return str(e)
+            tokens.update(
+                kstoken=ks_token, ksrefreshtoken=ks_refresh_token, ksexpiry=ks_expiry
             )
-            return
-        except login.AddHouseHoldDeviceError as e:
-            dialog = xbmcgui.Dialog()
-            dialog.ok(addon_local.getAddonInfo("name"), str(e))
-            return
-        addon_local.setSetting("kstoken", ks_token)
-        addon_local.setSetting("ksrefreshtoken", ks_refresh_token)
-        addon_local.setSetting("ksexpiry", str(ks_expiry))
-        prog_dialog.update(95, addon_local.getLocalizedString(30072))
-        # get household id and user id
-        # used later for playback stats
-        household_obj = household.get_household(
-            session,
-            ks_token,
-            api_version=addon_local.getSetting("apiversion"),
-            client_tag=addon_local.getSetting("clienttag"),
-        )
-        household_id = household_obj.get("id", -1)
-        addon_local.setSetting("householdid", str(household_id))
-        user_id = next(
-            (user.get("id") for user in household_obj.get("users", [])),
-            -1,
-        )
-        addon_local.setSetting("userid", str(user_id))
+    finally:
+        # the OAuth tokens are kept even if the KS login failed
+        if tokens:
+            token_store.update(**tokens)
     prog_dialog.close()
     # show notification
     xbmcgui.Dialog().notification(
@@ -264,6 +331,203 @@ def authenticate(session: Session, addon_from_thread: xbmcaddon.Addon = None) ->
     )
 
 
+def run_listing(session: Session, listing: Callable[..., None], *args) -> None:
+    """
+    Runs a listing function. If the API returns an error, the directory is
+    ended with a notification instead of a script error. If the KS token
+    expired in the meantime, it's refreshed and the listing is run once more.
+
+    :param session: requests session
+    :param listing: The listing function, called with the session and args
+    :param args: The other arguments of the listing function
+    :return: None
+    """
+    try:
+        try:
+            listing(session, *args)
+        except SessionExpired:
+            # an expiry in the past makes authenticate refresh the token
+            token_store.update(ksexpiry=1)
+            authenticate(session)
+            listing(session, *args)
+    except YetiError as e:
+        xbmc.log(f"[{addon_name}] Listing failed: {e}", xbmc.LOGERROR)
+        xbmcgui.Dialog().notification(
+            addon_name, e.message, icon=xbmcgui.NOTIFICATION_ERROR, time=5000
+        )
+        xbmcplugin.endOfDirectory(int(argv[1]), succeeded=False)
+
+
+def migrate_legacy_tokens(addon_from_thread: xbmcaddon.Addon = None) -> None:
+    """
+    Moves the tokens stored in the settings by older versions to the token store,
+    so the users stay logged in after an update. Only runs if there is no token
+    file yet.
+
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: None
+    """
+    if os.path.exists(token_store.path):
+        return
+    addon_local = addon_from_thread or addon
+    tokens = {name: addon_local.getSetting(name) for name in legacy_token_settings}
+    if not tokens["kstoken"]:
+        return
+    for name in ("oauthexpires", "ksexpiry"):
+        tokens[name] = int(tokens[name]) if tokens[name].isdigit() else None
+    token_store.update(**{name: value or None for name, value in tokens.items()})
+    # the tokens aren't left behind in the settings
+    for name in legacy_token_settings:
+        addon_local.setSetting(name, "")
+
+
+def refresh_ks_session(
+    session: Session, addon_from_thread: xbmcaddon.Addon = None
+) -> None:
+    """
+    Refreshes the KS token with the stored refresh token and stores the new one.
+    Raises login.RefreshSessionFailed if the refresh fails.
+
+    :param session: The requests session to use
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: None
+    """
+    addon_local = addon_from_thread or addon
+    ks_token, ks_refresh_token, ks_expiry = login.refresh_ks_token(
+        session,
+        token_store.get("kstoken"),
+        token_store.get("ksrefreshtoken"),
+        api_version=addon_local.getSetting("apiversion"),
+        client_tag=addon_local.getSetting("clienttag"),
+    )
+    token_store.update(
+        kstoken=ks_token, ksrefreshtoken=ks_refresh_token, ksexpiry=ks_expiry
+    )
+
+
+def epg_store_path(addon_from_thread: xbmcaddon.Addon = None) -> str:
+    """
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: The path of the local program guide store
+    """
+    addon_local = addon_from_thread or addon
+    profile = xbmcvfs.translatePath(addon_local.getAddonInfo("profile"))
+    return os.path.join(profile, "epg.db")
+
+
+def open_epg_store(addon_from_thread: xbmcaddon.Addon = None) -> EPGStore:
+    """
+    Opens the local program guide store in the addon's profile directory.
+
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: The EPGStore object
+    """
+    path = epg_store_path(addon_from_thread)
+    profile = os.path.dirname(path)
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return EPGStore(path)
+
+
+def open_response_cache(
+    addon_from_thread: xbmcaddon.Addon = None, check_refresh: bool = True
+) -> Optional[ResponseCache]:
+    """
+    Opens the cache of the listings in the addon's profile directory.
+    Stored responses are ignored once after the "Update" context menu
+     item was used.
+
+    :param addon_from_thread: The addon instance to use (optional)
+    :param check_refresh: Whether to check (and reset) the "Update" flag,
+     the service leaves it to the plugin
+    :return: The ResponseCache object or None if caching is disabled
+    """
+    addon_local = addon_from_thread or addon
+    if not addon_local.getSettingBool("responsecache"):
+        return None
+    bypass = False
+    if check_refresh:
+        window = xbmcgui.Window(10000)
+        property_name = f"{addon_local.getAddonInfo('id')}.refresh"
+        bypass = window.getProperty(property_name) == "true"
+        if bypass:
+            window.clearProperty(property_name)
+    profile = xbmcvfs.translatePath(addon_local.getAddonInfo("profile"))
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return ResponseCache(
+        os.path.join(profile, "responses.db"),
+        addon_local.getSettingInt("responsecachesize") * 1024 * 1024,
+        bypass,
+        addon_local.getSetting("username"),
+    )
+
+
+def open_auth_lock(addon_from_thread: xbmcaddon.Addon = None) -> FileLock:
+    """
+    Returns the lock guarding the login in the addon's profile directory.
+
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: The FileLock object
+    """
+    addon_local = addon_from_thread or addon
+    profile = xbmcvfs.translatePath(addon_local.getAddonInfo("profile"))
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return FileLock(os.path.join(profile, "auth.lock"))
+
+
+def open_reference_cache(addon_from_thread: xbmcaddon.Addon = None) -> ReferenceCache:
+    """
+    Opens the cache of the near-static reference data (device brands,
+     OAuth portal details, channels) in the addon's profile directory.
+
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: The ReferenceCache object
+    """
+    addon_local = addon_from_thread or addon
+    profile = xbmcvfs.translatePath(addon_local.getAddonInfo("profile"))
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return ReferenceCache(
+        os.path.join(profile, "reference.json"), addon_local.getSetting("username")
+    )
+
+
+def notify_service(message: str, data: dict = None) -> None:
+    """
+    Sends a notification to the addon's service.
+
+    :param message: The message (ie. refresh_channels)
+    :param data: Data sent along with the message (optional)
+    :return: None
+    """
+    xbmc.executeJSONRPC(
+        dumps(
+            {
+                "jsonrpc": "2.0",
+                "method": "JSONRPC.NotifyAll",
+                "params": {
+                    "sender": addon.getAddonInfo("id"),
+                    "message": message,
+                    "data": data,
+                },
+                "id": 1,
+            }
+        )
+    )
+
+
+def refresh() -> None:
+    """
+    Refreshes the current listing, bypassing the cached responses.
+
+    :return: None
+    """
+    xbmcgui.Window(10000).setProperty(f"{addon.getAddonInfo('id')}.refresh", "true")
+    xbmc.executebuiltin("Container.Refresh")
+
+
 def prepare_session() -> Session:
     """
     Prepare a requests session for use within the addon. Also sets
@@ -277,6 +541,11 @@ def prepare_session() -> Session:
         user_agent = addon.getSetting("useragent")
     session = Session()
     session.headers.update({"User-Agent": user_agent})
+    # enough kept connections for the concurrent requests of the EPG export
+    # (two pools of at most 16 workers), so they aren't reopened
+    adapter = HTTPAdapter(pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     return session
 
 
@@ -390,21 +659,46 @@ def channel_list(session: Session) -> None:
     :param session: The requests session.
     :return: None
     """
-    channels = media_list.get_channel_list(
-        session,
-        addon.getSetting("kstoken"),
-        addon.getSettingBool("listofficial"),
-        api_version=addon.getSetting("apiversion"),
-        client_tag=addon.getSetting("clienttag"),
-    )
+    channels = None
+    # stale-while-revalidate: render the stored copy right away and
+    # let the service refresh it (forced updates skip the stored copy)
+    stale_while_revalidate = addon.getSettingBool("channelswr")
+    if stale_while_revalidate and not (response_cache and response_cache.bypass):
+        reference_cache = open_reference_cache()
+        stored = reference_cache.lookup("channels")
+        if stored and stored["official"] == addon.getSettingBool("listofficial"):
+            channels = stored["channels"]
+            if not reference_cache.is_fresh("channels"):
+                notify_service("refresh_channels")
+    if channels is None and stale_while_revalidate:
+        channels, _ = update_stored_channel_list(session)
+    elif channels is None:
+        channels = media_list.iter_channel_list(
+            session,
+            token_store.get("kstoken"),
+            addon.getSettingBool("listofficial"),
+            api_version=addon.getSetting("apiversion"),
+            client_tag=addon.getSetting("clienttag"),
+            response_cache=response_cache,
+            adaptive=addon.getSettingBool("adaptivepagesize"),
+        )
     if addon.getSettingBool("sortabc"):
-        channels.sort(key=lambda channel: channel.get("name"))
+        channels = sorted(channels, key=lambda channel: channel.get("name"))
     hide_adult = addon.getSettingBool("hideadult")
+    # current programs from the locally stored guide (if the EPG was exported)
+    airing = {}
+    if os.path.exists(epg_store_path()):
+        with open_epg_store() as store:
+            airing = store.get_all_airing(int(time()))
     for channel in channels:
         channel_id = channel.get("id")
         if not channel_id:
             continue
         name = channel.get("name")
+        description = None
+        if channel_id in airing:
+            program = airing[channel_id]
+            description = f"{unix_to_date(program.get('startDate', 0))} - {unix_to_date(program.get('endDate', 0))}\n{program.get('name', '')}"
         images = channel.get("images")
         is_adult = channel.get("metas", {}).get("Adult", {}).get("value", False)
         if is_adult:
@@ -429,6 +723,7 @@ def channel_list(session: Session) -> None:
             is_directory=False,
             id=channel_id,
             icon=image,
+            description=description,
             is_livestream=True,
             refresh=True,
         )
@@ -436,6 +731,36 @@ def channel_list(session: Session) -> None:
     xbmcplugin.setContent(int(argv[1]), "videos")
 
 
+def update_stored_channel_list(
+    session: Session, addon_from_thread: xbmcaddon.Addon = None
+) -> Tuple[list, bool]:
+    """
+    Fetches the list of live channels and stores it for the channel list's
+     stale-while-revalidate mode.
+
+    :param session: The requests session.
+    :param addon_from_thread: The addon instance to use (optional)
+    :return: A tuple containing the channels and whether they differ
+     from the previously stored ones
+    """
+    addon_local = addon_from_thread or addon
+    official = addon_local.getSettingBool("listofficial")
+    stored = {
+        "official": official,
+        "channels": media_list.get_channel_list(
+            session,
+            token_store.get("kstoken"),
+            official,
+            api_version=addon_local.getSetting("apiversion"),
+            client_tag=addon_local.getSetting("clienttag"),
+        ),
+    }
+    reference_cache = open_reference_cache(addon_local)
+    changed = reference_cache.lookup("channels") != stored
+    reference_cache.set("channels", stored)
+    return stored["channels"], changed
+
+
 def _gen_mgr_params(playback_type: str, playback_obj: list) -> str:
     """
     Generates the parameters for playback manager's statistics report.
@@ -484,7 +809,7 @@ def play(session: Session, media_id: int, extra: str, title: str, icon: str) ->
     if extra == "recording":
         playback_obj = playback.get_playback_obj(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             media_id,
             asset_reference_type="npvr",
             asset_type="recording",
@@ -495,7 +820,7 @@ def play(session: Session, media_id: int, extra: str, title: str, icon: str) ->
     elif extra == "epg":
         playback_obj = playback.get_playback_obj(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             media_id,
             asset_reference_type="epg_internal",
             asset_type="epg",
@@ -506,7 +831,7 @@ def play(session: Session, media_id: int, extra: str, title: str, icon: str) ->
     else:
         playback_obj = playback.get_playback_obj(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             media_id,
             api_version=addon.getSetting("apiversion"),
             client_tag=addon.getSetting("clienttag"),
@@ -632,19 +957,23 @@ def recording_listing(session: Session, media_id: int = None) -> None:
     :return: None
     """
     if media_id:
-        recordings = media_list.get_recording_titles(
+        recordings = media_list.iter_recording_titles(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             media_id,
             api_version=addon.getSetting("apiversion"),
             client_tag=addon.getSetting("clienttag"),
+            response_cache=response_cache,
+            adaptive=addon.getSettingBool("adaptivepagesize"),
         )
     else:
-        recordings = media_list.get_recording_groups(
+        recordings = media_list.iter_recording_groups(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             api_version=addon.getSetting("apiversion"),
             client_tag=addon.getSetting("clienttag"),
+            response_cache=response_cache,
+            adaptive=addon.getSettingBool("adaptivepagesize"),
         )
     for recording in recordings:
         title_id = recording.get("recordingId")
@@ -760,7 +1089,7 @@ def add_recording(session: Session, media_id: int = None) -> None:
     try:
         recording = misc.create_single_recording(
             session,
-            addon.getSetting("kstoken"),
+            token_store.get("kstoken"),
             user_input,
             api_version=addon.getSetting("apiversion"),
             client_tag=addon.getSetting("clienttag"),
@@ -775,6 +1104,8 @@ def add_recording(session: Session, media_id: int = None) -> None:
         else:
             dialog.ok(addon_name, str(e))
         return
+    if response_cache is not None:
+        response_cache.invalidate("recordings")
     status = recording.get("status")
     if status in ["RECORDING", "SCHEDULED"]:
         dialog.ok(addon_name, addon.getLocalizedString(30127))
@@ -784,6 +1115,58 @@ def add_recording(session: Session, media_id: int = None) -> None:
         dialog.ok(addon_name, addon.getLocalizedString(30051).format(response=status))
 
 
+def get_catalog_page(
+    session: Session,
+    action: str,
+    category_id: int,
+    page: int,
+    cache: Optional[ResponseCache] = None,
+    addon_from_thread: xbmcaddon.Addon = None,
+) -> Tuple[list, int]:
+    """
+    Fetches a page of the movies, documentaries or series listing.
+
+    :param session: requests session
+    :param action: the action of the listing (ie. movies, series_list)
+    :param category_id: the id of the category to list
+    :param page: page number to fetch
+    :param cache: the response cache to use (optional)
+    :param addon_from_thread: the addon instance to use (optional)
+    :return: A tuple containing the list of items and the total number of items
+    """
+    addon_local = addon_from_thread or addon
+    get_page = (
+        media_list.get_series_page
+        if action == "series_list"
+        else media_list.get_movies_page
+    )
+    return get_page(
+        session,
+        token_store.get("kstoken"),
+        category_id,
+        page,
+        page_size=addon_local.getSettingInt("pagesize"),
+        api_version=addon_local.getSetting("apiversion"),
+        client_tag=addon_local.getSetting("clienttag"),
+        response_cache=cache,
+    )
+
+
+def prefetch_catalog_page(action: str, category_id: int, page: int) -> None:
+    """
+    Asks the service to fetch a page of a catalog listing into the
+     response cache, so it opens without waiting once it's requested.
+
+    :param action: the action of the listing (ie. movies, series_list)
+    :param category_id: the id of the category to list
+    :param page: page number to fetch
+    :return: None
+    """
+    if response_cache is None or not addon.getSettingBool("prefetchpages"):
+        return
+    notify_service("prefetch_page", {"action": action, "id": category_id, "page": page})
+
+
 def movies_listing(session: Session, action: str, movie_id: int, page: int) -> None:
     """
     List movies.
@@ -794,13 +1177,8 @@ def movies_listing(session: Session, action: str, movie_id: int, page: int) -> N
     :param page: page number to list
     :return: None
     """
-    movies, total_count = media_list.get_movies_page(
-        session,
-        addon.getSetting("kstoken"),
-        movie_id,
-        page,
-        api_version=addon.getSetting("apiversion"),
-        client_tag=addon.getSetting("clienttag"),
+    movies, total_count = get_catalog_page(
+        session, action, movie_id, page, response_cache
     )
     for movie in movies:
         media_id = movie.get("id")
@@ -867,7 +1245,7 @@ def movies_listing(session: Session, action: str, movie_id: int, page: int) -> N
             extra="epg",
         )
     # check if there are more pages
-    if total_count > (page + 1) * 20:  # TODO: don't hardcode page size
+    if total_count > page * addon.getSettingInt("pagesize"):
         add_item(
             plugin_prefix=argv[0],
             handle=argv[1],
@@ -876,6 +1254,7 @@ def movies_listing(session: Session, action: str, movie_id: int, page: int) -> N
             is_directory=True,
             extra=page + 1,
         )
+        prefetch_catalog_page(action, movie_id, page + 1)
     xbmcplugin.endOfDirectory(int(argv[1]))
     if action == "movies":
         xbmcplugin.setContent(int(argv[1]), "movies")
@@ -891,13 +1270,12 @@ def series_listing(session: Session, page: int) -> None:
     :param page: page number to list
     :return: None
     """
-    series, total_count = media_list.get_series_page(
+    series, total_count = get_catalog_page(
         session,
-        addon.getSetting("kstoken"),
+        "series_list",
         358054,  # TODO: don't hardcode this
         page,
-        api_version=addon.getSetting("apiversion"),
-        client_tag=addon.getSetting("clienttag"),
+        response_cache,
     )
     for serie in series:
         metas = serie.get("metas", {})
@@ -948,7 +1326,7 @@ def series_listing(session: Session, page: int) -> None:
             extra="1",
         )
     # check if there are more pages
-    if total_count > (page + 1) * 20:  # TODO: don't hardcode page size
+    if total_count > page * addon.getSettingInt("pagesize"):
         add_item(
             plugin_prefix=argv[0],
             handle=argv[1],
@@ -957,6 +1335,7 @@ def series_listing(session: Session, page: int) -> None:
             is_directory=True,
             extra=page + 1,
         )
+        prefetch_catalog_page("series_list", 358054, page + 1)
     xbmcplugin.endOfDirectory(int(argv[1]))
     xbmcplugin.setContent(int(argv[1]), "tvshows")
 
@@ -971,10 +1350,12 @@ def series_episodes(session: Session, media_id: int) -> None:
     """
     episodes = media_list.get_series_titles(
         session,
-        addon.getSetting("kstoken"),
+        token_store.get("kstoken"),
         media_id,
         api_version=addon.getSetting("apiversion"),
         client_tag=addon.getSetting("clienttag"),
+        response_cache=response_cache,
+        adaptive=addon.getSettingBool("adaptivepagesize"),
     )
     episodes = sorted(
         episodes,
@@ -1072,7 +1453,7 @@ def delete_recording(session: Session, media_id: int) -> None:
         try:
             result = misc.delete_recording(
                 session,
-                addon.getSetting("kstoken"),
+                token_store.get("kstoken"),
                 media_id,
                 api_version=addon.getSetting("apiversion"),
                 client_tag=addon.getSetting("clienttag"),
@@ -1080,6 +1461,8 @@ def delete_recording(session: Session, media_id: int) -> None:
         except misc.RecordingDeletionError as e:
             dialog.ok(addon_name, str(e))
             return
+        if response_cache is not None:
+            response_cache.invalidate("recordings")
         if result == "DELETED":
             dialog.ok(addon_name, addon.getLocalizedString(30050))
         else:
@@ -1100,26 +1483,42 @@ def device_list(session: Session) -> None:
     # since it's not used often
     from resources.lib.yeti import devices
 
-    # request device list
-    device_list, _ = devices.get_devices(
-        session,
-        addon.getSetting("kstoken"),
-        api_version=addon.getSetting("apiversion"),
-        client_tag=addon.getSetting("clienttag"),
+    # brands rarely change, they are only requested if not stored yet
+    # and refreshed in the background once expired
+    reference_cache = open_reference_cache()
+    cached_brands = reference_cache.lookup(
+        "brands",
+        lambda: devices.get_device_brands(
+            session,
+            token_store.get("kstoken"),
+            api_version=addon.getSetting("apiversion"),
+            client_tag=addon.getSetting("clienttag"),
+        ),
     )
-    # sort by lastActivityTime descending
-    device_list.sort(key=lambda x: x.get("lastActivityTime", 0), reverse=True)
-    # request currently streaming devices
-    streaming_devices, _ = devices.get_streaming_devices(
+    # request device list, currently streaming devices
+    # and the brands (if needed) in one go
+    device_list, streaming_devices, brands = devices.get_device_details(
         session,
-        addon.getSetting("kstoken"),
+        token_store.get("kstoken"),
+        cached_brands,
         api_version=addon.getSetting("apiversion"),
         client_tag=addon.getSetting("clienttag"),
     )
+    if cached_brands is None:
+        reference_cache.set("brands", brands)
     # create a lookup table for brands
-    brand_lookup = devices.get_brands(
+    brand_lookup = {brand["id"]: brand["name"] for brand in brands}
+    # sort by lastActivityTime descending
+    device_list.sort(key=lambda x: x.get("lastActivityTime", 0), reverse=True)
+    # look up the watched assets at once
+    streamed_media = media_list.get_media_by_ids(
         session,
-        addon.getSetting("kstoken"),
+        token_store.get("kstoken"),
+        [
+            streaming_device["asset"]["id"]
+            for streaming_device in streaming_devices
+            if streaming_device.get("asset", {}).get("id")
+        ],
         api_version=addon.getSetting("apiversion"),
         client_tag=addon.getSetting("clienttag"),
     )
@@ -1158,13 +1557,7 @@ def device_list(session: Session) -> None:
         )
         if asset_id:
             name = f"[COLOR=red]{addon.getLocalizedString(30073)} | {name}[/COLOR]"
-            media = media_list.get_media_by_id(
-                session,
-                addon.getSetting("kstoken"),
-                asset_id,
-                api_version=addon.getSetting("apiversion"),
-                client_tag=addon.getSetting("clienttag"),
-            )
+            media = streamed_media.get(str(asset_id))
             if media:
                 name += f" - {media.get('name')}"
                 description += (
@@ -1205,7 +1598,7 @@ def delete_device(session: Session, device_id: str) -> None:
         try:
             result = devices.delete_device(
                 session,
-                addon.getSetting("kstoken"),
+                token_store.get("kstoken"),
                 device_id,
                 api_version=addon.getSetting("apiversion"),
                 client_tag=addon.getSetting("clienttag"),
@@ -1232,12 +1625,8 @@ def clear_settings(keep_user_agent: bool = False) -> None:
     :param keep_user_agent: whether to keep the user agent
     :return: None
     """
-    addon.setSetting("oauthaccesstoken", "")
-    addon.setSetting("oauthrefreshtoken", "")
-    addon.setSetting("oauthexpires", "")
-    addon.setSetting("kstoken", "")
-    addon.setSetting("ksrefreshtoken", "")
-    addon.setSetting("ksexpiry", "")
+    token_store.clear()
+    open_reference_cache().invalidate()
     if not keep_user_agent:
         addon.setSetting("useragent", "")
 
@@ -1262,7 +1651,7 @@ def reset_device_key(session: Session) -> None:
         authenticate(session)
         try:
             result = devices.delete_device(
-                session, addon.getSetting("kstoken"), old_device_key
+                session, token_store.get("kstoken"), old_device_key
             )
         except devices.DeviceDeletionError as e:
             dialog.ok(addon_name, str(e))
@@ -1285,7 +1674,13 @@ def update_epg(_session: Session) -> None:
     """
     # local import should be fine
     # since it's not used often
-    from export_data import days_to_seconds, export_epg, int_to_time
+    from export_data import (
+        GuideCache,
+        days_to_seconds,
+        export_epg,
+        int_to_time,
+        reload_pvr,
+    )
 
     # get epg settings
     from_time = addon.getSetting("epgfrom")
@@ -1301,7 +1696,16 @@ def update_epg(_session: Session) -> None:
         addon_name,
         f"{addon.getLocalizedString(30100)}: {int_to_time(from_time)} - {int_to_time(to_time)}",
     )
-    export_epg(addon, _session, from_time, to_time)
+    with open_epg_store() as store:
+        changed = export_epg(
+            addon,
+            _session,
+            from_time,
+            to_time,
+            guide_cache=GuideCache(store, incremental=False),
+        )
+    if changed and addon.getSettingBool("reloadpvr"):
+        reload_pvr(addon)
 
 
 def about_dialog() -> None:
@@ -1329,9 +1733,23 @@ def catchup(id: str, start: str, stop: str) -> None:
     :return: None
     """
     dialog = xbmcgui.Dialog()
+    title = ""
+    icon = ""
+    # prefer the locally stored guide, the times in the XMLTV file might be outdated
+    program = None
+    if id.isdigit() and os.path.exists(epg_store_path()):
+        with open_epg_store() as store:
+            program = store.get_programme(int(id))
+    if program:
+        start = program.get("startDate", start)
+        stop = program.get("endDate", stop)
+        title = program.get("name", "")
+        images = program.get("images")
+        if images:
+            icon = images[0]["url"] + "/height/360/width/640"
     # if it was in the past and ended already, let's play it
     if int(start) < int(time()) and int(stop) < int(time()):
-        play(session, id, "epg", "", "")
+        play(session, id, "epg", title, icon)
     # if it's in the future, but hasn't started yet, offer to set a recording
     elif int(start) > int(time()):
         if dialog.yesno(
@@ -1356,7 +1774,7 @@ def catchup(id: str, start: str, stop: str) -> None:
         if choice == 0:
             add_recording(session, id)
         elif choice == 1:
-            play(session, id, "epg", "", "")
+            play(session, id, "epg", title, icon)
 
 
 if __name__ == "__main__":
@@ -1366,6 +1784,7 @@ if __name__ == "__main__":
     session = prepare_session()
     # authenticate if necessary
     authenticate(session)
+    response_cache = open_response_cache()
 
     # main router
     if action is None:
@@ -1389,19 +1808,31 @@ if __name__ == "__main__":
             params.get("icon"),
         )
     elif action == "channel_list":
-        channel_list(session)
+        run_listing(session, channel_list)
     elif action == "movies":
-        movies_listing(session, params.get("action"), 357915, int(params.get("extra")))
+        run_listing(
+            session,
+            movies_listing,
+            params.get("action"),
+            357915,
+            int(params.get("extra")),
+        )
     elif action == "documentaries":
-        movies_listing(session, params.get("action"), 358677, int(params.get("extra")))
+        run_listing(
+            session,
+            movies_listing,
+            params.get("action"),
+            358677,
+            int(params.get("extra")),
+        )
     elif action == "series_list":
-        series_listing(session, int(params.get("extra")))
+        run_listing(session, series_listing, int(params.get("extra")))
     elif action == "series_episodes":
-        series_episodes(session, params.get("id"))
+        run_listing(session, series_episodes, params.get("id"))
     elif action == "rec_main":
-        recording_listing(session)
+        run_listing(session, recording_listing)
     elif action == "rec_titles":
-        recording_listing(session, params.get("id"))
+        run_listing(session, recording_listing, params.get("id"))
     elif action == "rec_add":
         add_recording(session)
     elif action == "catchup":
@@ -1412,12 +1843,17 @@ if __name__ == "__main__":
         device_list(session)
     elif action == "del_device":
         delete_device(session, params.get("device_id"))
+    elif action == "refresh":
+        refresh()
     elif action == "settings":
         addon.openSettings()
     elif action == "export_chanlist":
         import export_data
 
-        export_data.export_channel_list(session)
+        if export_data.export_channel_list(addon, session) and addon.getSettingBool(
+            "reloadpvr"
+        ):
+            export_data.reload_pvr(addon)
         exit()
     elif action == "export_epg":
         update_epg(session)
@@ -1,18 +1,31 @@
 import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime
+from heapq import merge
+from json import dumps, loads
 from time import time
+from typing import Dict, Iterable, List
 from urllib.parse import urlencode
 
 import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcvfs
-import xmltodict  # type: ignore
-from default import authenticate
+from default import authenticate, open_epg_store, prepare_session, token_store
 from requests import Session
+from resources.lib.utils import iter_ordered
+from resources.lib.utils.atomic import AtomicWriter
+from resources.lib.utils.epg_store import EPGStore
+from resources.lib.utils.xmltv import ProgrammeConverter, XMLTVWriter
 from resources.lib.yeti import media_list
 
 
+class ExportAborted(Exception):
+    """Raised when an export is cancelled through its kill event"""
+
+    pass
+
+
 def get_path(addon: xbmcaddon.Addon, is_epg: bool = False) -> str:
     """
     Check if the channel and epg path exists
@@ -24,6 +37,8 @@ def get_path(addon: xbmcaddon.Addon, is_epg: bool = False) -> str:
     path = addon.getSetting("channelexportpath")
     if is_epg:
         name = addon.getSetting("epgexportname")
+        if name and addon.getSettingBool("epgcompress") and not name.endswith(".gz"):
+            name += ".gz"
     else:
         name = addon.getSetting("channelexportname")
     if not all([path, name]):
@@ -37,12 +52,12 @@ def get_path(addon: xbmcaddon.Addon, is_epg: bool = False) -> str:
     return xbmcvfs.translatePath(f"{path}/{name}")
 
 
-def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
+def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> bool:
     """
     Export channel list to an m3u file
 
     :param _session: requests.Session object
-    :return: None
+    :return: Whether the exported file changed
     """
     dialog = xbmcgui.Dialog()
     try:
@@ -53,26 +68,26 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
             addon.getLocalizedString(30081),
             xbmcgui.NOTIFICATION_ERROR,
         )
-        return
+        return False
     if not all([addon.getSetting("username"), addon.getSetting("password")]):
         dialog.notification(
             addon.getAddonInfo("name"),
             addon.getLocalizedString(30082),
             xbmcgui.NOTIFICATION_ERROR,
         )
-        return
+        return False
     authenticate(_session, addon)
     # print m3u header
     output = "#EXTM3U\n\n"
-    channels = media_list.get_channel_list(
+    channels = media_list.iter_channel_list(
         _session,
-        addon.getSetting("kstoken"),
+        token_store.get("kstoken"),
         addon.getSettingBool("listofficial"),
         api_version=addon.getSetting("apiversion"),
         client_tag=addon.getSetting("clienttag"),
     )
     if addon.getSettingBool("sortabc"):
-        channels.sort(key=lambda channel: channel.get("name"))
+        channels = sorted(channels, key=lambda channel: channel.get("name"))
     hide_adult = addon.getSettingBool("hideadult")
     for channel in channels:
         channel_id = channel.get("id")
@@ -109,8 +124,9 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
         }
         url = f"plugin://{addon.getAddonInfo('id')}/?{urlencode(query)}"
         output += f"{url}\n\n"
+    writer = AtomicWriter(path)
     try:
-        with open(path, "w") as f:
+        with writer as f:
             f.write(output)
     except IOError:
         dialog.notification(
@@ -118,13 +134,14 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
             addon.getLocalizedString(30081),
             xbmcgui.NOTIFICATION_ERROR,
         )
-        return
+        return False
     dialog.notification(
         addon.getAddonInfo("name"),
         addon.getLocalizedString(30083),
         xbmcgui.NOTIFICATION_INFO,
         sound=False,
     )
+    return writer.changed
 
 
 def unix_to_epg_time(unix_time: int) -> str:
@@ -137,12 +154,302 @@ def unix_to_epg_time(unix_time: int) -> str:
     return datetime.utcfromtimestamp(unix_time).strftime("%Y%m%d%H%M%S %z")
 
 
+def _get_epg_sliced(
+    _session: Session,
+    ks_token: str,
+    channel_ids: List[int],
+    from_time: int,
+    to_time: int,
+    slice_length: int = 0,
+    executor: Executor = None,
+    **kwargs,
+) -> Dict[int, list]:
+    """
+    Fetches the program guide of multiple channels. Long windows are split
+     into slices that are fetched concurrently, as the pages of a single
+     search can only be requested one after another.
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param channel_ids: The linear asset ids of the channels
+    :param from_time: Unix timestamp of the start time
+    :param to_time: Unix timestamp of the end time
+    :param slice_length: Length of a slice in seconds, 0 disables slicing
+    :param executor: Executor to fetch the slices with
+    :param kwargs: Optional arguments passed to the API call
+    :return: A dict where the key is the channel id and the value is
+     the list of its programs ordered by start time
+    """
+    if not slice_length or executor is None or to_time - from_time <= slice_length:
+        return media_list.get_epg_by_linear_assets(
+            _session, ks_token, channel_ids, [(from_time, to_time)], **kwargs
+        )
+    futures = [
+        executor.submit(
+            media_list.get_epg_slice_by_linear_assets,
+            _session,
+            ks_token,
+            channel_ids,
+            start,
+            min(start + slice_length, to_time),
+            to_time,
+            **kwargs,
+        )
+        for start in range(from_time, to_time, slice_length)
+    ]
+    try:
+        slices = [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+    guides = {}
+    for channel_id in channel_ids:
+        guide = guides[channel_id] = []
+        seen = set()
+        for program in merge(
+            *(guide_slice[channel_id] for guide_slice in slices),
+            key=lambda program: program.get("startDate", 0),
+        ):
+            # a program may show up in two slices if it got moved in between
+            if program.get("id") in seen:
+                continue
+            seen.add(program.get("id"))
+            guide.append(program)
+    return guides
+
+
+class GuideCache:
+    """
+    Keeps the fetched guide of every channel in an EPGStore. In incremental
+     mode an export only has to download the newly exposed future edge of
+     the window and re-check the near-term programs, everything else is read
+     back from the store. Expired programs are purged from the store.
+     The whole window is fetched again periodically to pick up changes
+     further ahead in the guide.
+    """
+
+    # fields of the program objects used by the XMLTV export,
+    # everything else is dropped to keep the store small
+    fields = (
+        "id",
+        "name",
+        "description",
+        "startDate",
+        "endDate",
+        "enableCdvr",
+        "images",
+        "metas",
+    )
+    metas = ("ContentType", "Year", "SeasonNumber", "EpisodeNumber", "EpisodeName")
+
+    def __init__(
+        self,
+        store: EPGStore,
+        incremental: bool = True,
+        recheck_window: int = 6 * 60 * 60,
+        full_refresh_interval: int = 24 * 60 * 60,
+    ) -> None:
+        """
+        :param store: EPGStore object to keep the guide in
+        :param incremental: Whether to only fetch the changes or always
+         the whole window
+        :param recheck_window: Length of the near-term window that is always
+         fetched again (in seconds)
+        :param full_refresh_interval: Seconds after which the whole window
+         is fetched again
+        """
+        self.store = store
+        self.incremental = incremental
+        self.recheck_window = recheck_window
+        self.full_refresh_interval = full_refresh_interval
+        self.full_refresh = False
+
+    def _trim(self, epg: dict) -> dict:
+        """
+        Strips a program object down to the fields used by the export.
+
+        :param epg: The program object
+        :return: The trimmed program object
+        """
+        trimmed = {key: epg[key] for key in self.fields if key in epg}
+        images = trimmed.get("images")
+        if images:
+            trimmed["images"] = [
+                next(
+                    (image for image in images if image.get("ratio") == "16x9"),
+                    images[0],
+                )
+            ]
+        if "metas" in trimmed:
+            trimmed["metas"] = {
+                key: value
+                for key, value in trimmed["metas"].items()
+                if key in self.metas
+            }
+        return trimmed
+
+    def prepare(self, channel_ids: Iterable, from_time: int) -> None:
+        """
+        Prepares the store for an export: drops the guide of channels that
+         are no longer listed and the programs that ended before the window.
+         Also decides if the export is due for a full refresh.
+
+        :param channel_ids: The ids of the current channels
+        :param from_time: Unix timestamp of the start time
+        :return: None
+        """
+        self.store.retain_channels(channel_ids)
+        self.store.purge(from_time)
+        # stored along with the guide, so restarts don't postpone it
+        last_full_refresh = self.store.get_meta("last_full_refresh", 0)
+        self.full_refresh = int(time()) - last_full_refresh > self.full_refresh_interval
+        if self.full_refresh:
+            self.store.set_meta("last_full_refresh", int(time()))
+
+    def fetch(
+        self,
+        _session: Session,
+        ks_token: str,
+        channel_ids: List[int],
+        from_time: int,
+        to_time: int,
+        slice_length: int = 0,
+        slice_executor: Executor = None,
+        **kwargs,
+    ) -> Dict[int, list]:
+        """
+        Returns the program guide of multiple channels between two timestamps.
+         In incremental mode it only requests the parts that aren't
+         known yet or might have changed.
+
+        :param _session: requests.Session object
+        :param ks_token: The ks token
+        :param channel_ids: The linear asset ids of the channels
+        :param from_time: Unix timestamp of the start time
+        :param to_time: Unix timestamp of the end time
+        :param slice_length: Length of the slices full fetches are split into
+         (in seconds, 0 disables slicing)
+        :param slice_executor: Executor to fetch the slices with
+        :param kwargs: Optional arguments passed to the API call
+        :return: A dict where the key is the channel id and the value is
+         the list of its programs ordered by start time
+        """
+        full_fetch = []
+        last_ends = {}
+        for channel_id in channel_ids:
+            last_end = self.store.get_last_end(channel_id)
+            if not self.incremental or self.full_refresh or last_end is None:
+                full_fetch.append(channel_id)
+            else:
+                last_ends[channel_id] = last_end
+        guides = {}
+        if full_fetch:
+            fetched = _get_epg_sliced(
+                _session,
+                ks_token,
+                full_fetch,
+                from_time,
+                to_time,
+                slice_length,
+                slice_executor,
+                **kwargs,
+            )
+            for channel_id in full_fetch:
+                guide = [self._trim(epg) for epg in fetched[channel_id]]
+                self.store.replace(channel_id, [(from_time, to_time)], guide)
+                guides[channel_id] = guide
+        if not last_ends:
+            return guides
+        recheck_from = max(int(time()), from_time)
+        recheck_to = min(recheck_from + self.recheck_window, to_time)
+        # the future edge starts where the last known program ends,
+        # the channels of the batch share the earliest one
+        edge_from = max(min(last_ends.values()), from_time)
+        if edge_from <= recheck_to:
+            # the edge and the near-term window overlap, fetch them as one
+            ranges = [(min(edge_from, recheck_from), to_time)]
+        else:
+            ranges = [(recheck_from, recheck_to), (edge_from, to_time)]
+        ranges = [(start, end) for start, end in ranges if start < end]
+        if ranges:
+            fetched = media_list.get_epg_by_linear_assets(
+                _session, ks_token, list(last_ends), ranges, **kwargs
+            )
+            # replace everything the API would have returned for the ranges
+            for channel_id in last_ends:
+                self.store.replace(
+                    channel_id,
+                    ranges,
+                    (self._trim(epg) for epg in fetched[channel_id]),
+                )
+        for channel_id in last_ends:
+            guides[channel_id] = self.store.get_guide(channel_id, from_time, to_time)
+        return guides
+
+
+def _fetch_epg(
+    _session: Session,
+    ks_token: str,
+    channel_ids: List[int],
+    from_time: int,
+    to_time: int,
+    kill_event: threading.Event = None,
+    guide_cache: GuideCache = None,
+    slice_length: int = 0,
+    slice_executor: Executor = None,
+    **kwargs,
+) -> Dict[int, list]:
+    """
+    Fetches the program guide of a batch of channels. Meant to be run
+     in a worker thread, returns empty guides if the export got killed
+     before the worker could start.
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param channel_ids: The linear asset ids of the channels
+    :param from_time: Unix timestamp of the start time
+    :param to_time: Unix timestamp of the end time
+    :param kill_event: threading.Event object to kill the thread (optional)
+    :param guide_cache: GuideCache object to store the guide in (optional)
+    :param slice_length: Length of the slices the window is split into
+     (in seconds, 0 disables slicing)
+    :param slice_executor: Executor to fetch the slices with (optional)
+    :param kwargs: Optional arguments passed to the API call
+    :return: A dict where the key is the channel id and the value is
+     the list of its programs
+    """
+    if kill_event and kill_event.is_set():
+        return {channel_id: [] for channel_id in channel_ids}
+    if guide_cache is not None:
+        return guide_cache.fetch(
+            _session,
+            ks_token,
+            channel_ids,
+            from_time,
+            to_time,
+            slice_length,
+            slice_executor,
+            **kwargs,
+        )
+    return _get_epg_sliced(
+        _session,
+        ks_token,
+        channel_ids,
+        from_time,
+        to_time,
+        slice_length,
+        slice_executor,
+        **kwargs,
+    )
+
+
 def export_epg(
     addon: xbmcaddon.Addon,
     _session: Session,
     from_time: int,
     to_time: int,
     kill_event: threading.Event = None,
+    guide_cache: GuideCache = None,
 ):
     """
     Exports all EPG data between two timestamps to an XMLTV file.
@@ -151,7 +458,8 @@ def export_epg(
     :param from_time: Unix timestamp of the start time
     :param to_time: Unix timestamp of the end time
     :param kill_event: threading.Event object to kill the thread (optional)
-    :return: None
+    :param guide_cache: GuideCache object to store the guide in (optional)
+    :return: Whether the exported file changed
     """
     xbmc.log(
         f"[{addon.getAddonInfo('name')}] Exporting EPG data from {unix_to_epg_time(from_time)} to {unix_to_epg_time(to_time)} started",
@@ -166,126 +474,111 @@ def export_epg(
             addon.getLocalizedString(30081),
             xbmcgui.NOTIFICATION_ERROR,
         )
-        return
+        return False
     if not all([addon.getSetting("username"), addon.getSetting("password")]):
         dialog.notification(
             addon.getAddonInfo("name"),
             addon.getLocalizedString(30082),
             xbmcgui.NOTIFICATION_ERROR,
         )
-        return
+        return False
     authenticate(_session, addon)
-    epg_in_description = addon.getSettingBool("epgidindesc")
+    converter = ProgrammeConverter(addon.getSettingBool("epgidindesc"))
+    ks_token = token_store.get("kstoken")
+    api_version = addon.getSetting("apiversion")
+    client_tag = addon.getSetting("clienttag")
     # channel data
-    channels = media_list.get_channel_list(
-        _session,
-        addon.getSetting("kstoken"),
-        addon.getSettingBool("listofficial"),
-        api_version=addon.getSetting("apiversion"),
-        client_tag=addon.getSetting("clienttag"),
-    )
-    channel_data = []
-    program_data = []
-    for channel in channels:
-        # check if we need to abort
-        if kill_event and kill_event.is_set():
-            return
-        channel_id = channel.get("id")
-        if not channel_id:
-            continue
-        name = channel.get("name").strip()
-        images = channel.get("images")
-        image = None
-        if images:
-            image = (
-                next(
-                    (image for image in images if image.get("ratio") == "16x9"),
-                    images[0],
-                )["url"]
-                + "/width/240"
-            )
-        # get epg data for channel
-        epg_data = media_list.get_epg_by_linear_asset(
+    channels = [
+        channel
+        for channel in media_list.iter_channel_list(
             _session,
-            addon.getSetting("kstoken"),
-            channel_id,
-            from_time,
-            to_time,
-            api_version=addon.getSetting("apiversion"),
-            client_tag=addon.getSetting("clienttag"),
+            ks_token,
+            addon.getSettingBool("listofficial"),
+            api_version=api_version,
+            client_tag=client_tag,
         )
-        channel = {
-            "@id": channel_id,
-            "display-name": name,
-            "icon": {"@src": image},
-        }
-        channel_data.append(channel)
-        for epg in epg_data:
-            # check if we need to abort
-            if kill_event and kill_event.is_set():
-                return
-            program_start_date = unix_to_epg_time(epg.get("startDate", 0))
-            program_end_date = unix_to_epg_time(epg.get("endDate", 0))
-            program_name = epg.get("name", "")
-            program_id = epg.get("id")
-            program_enable_cdvr = epg.get("enableCdvr", True)
-            if epg_in_description and program_id:
-                program_description = f"({'' if program_enable_cdvr else '!'}{program_id}) {epg.get('description', '')}"
-            else:
-                program_description = epg.get("description", "")
-            images = epg.get("images")
-            program_image = ""
-            if images:
-                program_image = (
-                    next(
-                        (image for image in images if image.get("ratio") == "16x9"),
-                        images[0],
-                    )["url"]
-                    + "/width/240"
+        if channel.get("id")
+    ]
+    if guide_cache is not None:
+        guide_cache.prepare((channel.get("id") for channel in channels), from_time)
+    workers = max(1, addon.getSettingInt("epgworkers"))
+    slice_length = addon.getSettingInt("epgslicehours") * 60 * 60
+    # write to a temporary file first, so an aborted export
+    # doesn't leave a truncated guide behind
+    output = AtomicWriter(
+        path, "w", addon.getSettingBool("epgcompress"), encoding="utf-8"
+    )
+    try:
+        # slices get their own pool: the batch workers wait for them,
+        # so sharing one pool could starve it
+        with output as f, XMLTVWriter(f) as writer, ThreadPoolExecutor(
+            max_workers=workers
+        ) as slice_executor, ThreadPoolExecutor(max_workers=workers) as executor:
+            for channel in channels:
+                images = channel.get("images")
+                image = None
+                if images:
+                    image = (
+                        next(
+                            (image for image in images if image.get("ratio") == "16x9"),
+                            images[0],
+                        )["url"]
+                        + "/width/240"
+                    )
+                writer.write_channel(
+                    {
+                        "@id": channel.get("id"),
+                        "display-name": channel.get("name").strip(),
+                        "icon": {"@src": image},
+                    }
                 )
-            program_metas = epg.get("metas", {})
-            program_content_type = program_metas.get("ContentType", {}).get(
-                "value", "Unknown"
+            # fetch the guide of multiple channel batches at once, but write
+            # the results in the original channel order
+            batch_size = max(1, addon.getSettingInt("epgbatchsize"))
+            batches = [
+                channels[idx : idx + batch_size]
+                for idx in range(0, len(channels), batch_size)
+            ]
+            results = iter_ordered(
+                executor,
+                lambda batch: _fetch_epg(
+                    _session,
+                    ks_token,
+                    [channel.get("id") for channel in batch],
+                    from_time,
+                    to_time,
+                    kill_event,
+                    guide_cache,
+                    slice_length,
+                    slice_executor,
+                    api_version=api_version,
+                    client_tag=client_tag,
+                    # the batches and slices already run concurrently
+                    max_workers=1,
+                ),
+                batches,
+                workers * 2,
             )
-            program_year = program_metas.get("Year", {}).get("value")
-
-            program = {
-                "@start": program_start_date,
-                "@stop": program_end_date,
-                "@channel": channel_id,
-                "title": {"@lang": "hu", "#text": program_name},
-                "desc": {"@lang": "hu", "#text": program_description},
-                "icon": {"@src": program_image},
-                "category": program_content_type,
-            }
-            if program_year:
-                program["date"] = program_year
-            program_season = program_metas.get("SeasonNumber", {}).get("value")
-            program_episode = program_metas.get("EpisodeNumber", {}).get("value")
-            if program_season and program_episode:
-                program["episode-num"] = {
-                    "@system": "xmltv_ns",
-                    "#text": f"{int(program_season) - 1}.{int(program_episode) - 1}.",
-                }
-            program_episode_name = program_metas.get("EpisodeName", {}).get("value")
-            if program_episode_name:
-                program["sub-title"] = {"@lang": "hu", "#text": program_episode_name}
-            if program_enable_cdvr:
-                program["@catchup-id"] = (
-                    f"plugin://plugin.video.notyet/?action=catchup&id={program_id}&start={epg.get('startDate', 0)}&end={epg.get('endDate', 0)}"
-                )
-            program_data.append(program)
-    xmltv_data = {
-        "tv": {
-            "@generator-info-name": "plugin.video.notyet",
-            "@generator-info-url": "",
-            "channel": channel_data,
-            "programme": program_data,
-        }
-    }
-    # convert dict to XML and write to file
-    with open(path, "w", encoding="utf-8") as f:
-        xmltodict.unparse(xmltv_data, output=f, encoding="utf-8")
+            for channel, epg_data in (
+                (channel, guides[channel.get("id")])
+                for batch, guides in results
+                for channel in batch
+            ):
+                # check if we need to abort
+                if kill_event and kill_event.is_set():
+                    raise ExportAborted()
+                for program in converter.convert(channel.get("id"), epg_data):
+                    # check if we need to abort
+                    if kill_event and kill_event.is_set():
+                        raise ExportAborted()
+                    writer.write_programme(program)
+    except ExportAborted:
+        return False
+    if not output.changed:
+        xbmc.log(
+            f"[{addon.getAddonInfo('name')}] EPG data unchanged, kept the previous export",
+            xbmc.LOGINFO,
+        )
     if addon.getSettingBool("epgnotifoncompletion"):
         dialog.notification(
             addon.getAddonInfo("name"),
@@ -293,6 +586,49 @@ def export_epg(
             xbmcgui.NOTIFICATION_INFO,
         )
     addon.setSetting("lastepgupdate", str(int(time())))
+    return output.changed
+
+
+def reload_pvr(addon: xbmcaddon.Addon) -> None:
+    """
+    Restarts IPTV Simple Client, so it loads the newly exported files.
+    Skipped if the client isn't enabled or if something is playing.
+
+    :return: None
+    """
+    details = loads(
+        xbmc.executeJSONRPC(
+            dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "Addons.GetAddonDetails",
+                    "params": {"addonid": "pvr.iptvsimple", "properties": ["enabled"]},
+                }
+            )
+        )
+    )
+    if not details.get("result", {}).get("addon", {}).get("enabled"):
+        return
+    if xbmc.Player().isPlaying():
+        xbmc.log(
+            f"[{addon.getAddonInfo('name')}] Playback in progress, not reloading PVR",
+            xbmc.LOGINFO,
+        )
+        return
+    xbmc.log(f"[{addon.getAddonInfo('name')}] Reloading PVR", xbmc.LOGINFO)
+    for enabled in (False, True):
+        xbmc.executeJSONRPC(
+            dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "Addons.SetAddonEnabled",
+                    "params": {"addonid": "pvr.iptvsimple", "enabled": enabled},
+                }
+            )
+        )
+        xbmc.sleep(1000)
 
 
 class EPGUpdaterThread(threading.Thread):
@@ -318,6 +654,9 @@ class EPGUpdaterThread(threading.Thread):
         self.last_updated = last_updated
         self.killed = threading.Event()
         self.failed_count = 0
+        self.guide_cache = GuideCache(
+            open_epg_store(addon), addon.getSettingBool("epgdeltaupdate")
+        )
 
     @property
     def now(self) -> int:
@@ -360,15 +699,18 @@ class EPGUpdaterThread(threading.Thread):
                 and not self.failed_count > self.addon.getSettingInt("epgfetchtries")
             ):
                 try:
-                    export_epg(
+                    changed = export_epg(
                         self.addon,
                         self._session,
                         self.from_time_from_now,
                         self.to_time_from_now,
                         self.killed,
+                        self.guide_cache,
                     )
                     self.last_updated = self.now
                     self.failed_count = 0
+                    if changed and self.addon.getSettingBool("reloadpvr"):
+                        reload_pvr(self.addon)
                 except Exception as e:
                     self.failed_count += 1
                     xbmc.log(
@@ -382,6 +724,7 @@ class EPGUpdaterThread(threading.Thread):
                     xbmc.LOGERROR,
                 )
                 self.killed.set()
+        self.guide_cache.store.close()
 
     def stop(self):
         """
@@ -424,9 +767,9 @@ def main_service(addon: xbmcaddon.Addon) -> EPGUpdaterThread:
             level=xbmc.LOGWARNING,
         )
         return
-    _session = Session()
+    _session = prepare_session()
     authenticate(_session, addon)
-    if not addon.getSetting("kstoken"):
+    if not token_store.get("kstoken"):
         xbmc.log(
             f"[{addon.getAddonInfo('name')}] No KSToken set, won't start",
             level=xbmc.LOGWARNING,
@@ -1,12 +1,25 @@
 import threading
+from json import loads
+from random import uniform
 from sys import argv
+from time import time
 from urllib.parse import parse_qsl
 
 import requests
 import xbmc
-import xbmcaddon
+from default import (
+    addon,
+    authenticate,
+    get_catalog_page,
+    open_auth_lock,
+    open_response_cache,
+    prepare_session,
+    refresh_ks_session,
+    token_store,
+    update_stored_channel_list,
+)
 from export_data import main_service
-from resources.lib.yeti import static
+from resources.lib.yeti import login, static
 
 # script responsible for monitoring playback and
 # doing keepalive requests if the playback is from plugin.video.notyet
@@ -14,7 +27,6 @@ from resources.lib.yeti import static
 # once the playback is stopped, also sends a teardown request
 
 timeout = 5
-addon = xbmcaddon.Addon()
 handle = f"[{addon.getAddonInfo('name')}]"
 
 xbmc.log(f"{handle} Playback Manager Service started", xbmc.LOGINFO)
@@ -49,7 +61,7 @@ def report_playback(
             },
             "programId": params.get("programId"),
         },
-        "ks": addon.getSetting("kstoken"),
+        "ks": token_store.get("kstoken"),
     }
     xbmc.log(
         f"{handle} Playback Manager Service: sending bookmark request: {playing_state}",
@@ -63,7 +75,7 @@ def report_playback(
             timeout=3,
         )
         xbmc.log(
-            f"{handle} Playback Manager Service: bookmark request data: {str(data).replace(addon.getSetting('kstoken'), '***')}",
+            f"{handle} Playback Manager Service: bookmark request data: {str(data).replace(token_store.get('kstoken'), '***')}",
             xbmc.LOGDEBUG,
         )
         xbmc.log(
@@ -303,14 +315,157 @@ class XBMCPlayer(xbmc.Player):
             )
 
 
+class TokenRefreshThread(threading.Thread):
+    """
+    Refreshes the KS token shortly before it expires, so the plugin finds
+     a valid one and doesn't have to refresh it while the user waits.
+    The refresh time is randomised within a window before the expiry,
+     so not every installation hits the API at the same moment.
+    """
+
+    # seconds before the expiry when the refresh window ends
+    margin = 10 * 60
+    # length of the refresh window in seconds
+    jitter = 20 * 60
+    # longest sleep, the token may be replaced by the plugin in the meantime
+    poll_interval = 15 * 60
+    # seconds to wait after a failed refresh
+    retry_interval = 5 * 60
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.killed = threading.Event()
+
+    def run(self):
+        offset = 0
+        scheduled_expiry = None
+        # expiry of the token whose refresh token the API rejected
+        rejected_expiry = None
+        while not self.killed.is_set():
+            ks_expiry = token_store.get("ksexpiry")
+            if not ks_expiry or not token_store.get("ksrefreshtoken"):
+                # not logged in yet, the plugin obtains the first token
+                self.killed.wait(self.poll_interval)
+                continue
+            if ks_expiry == rejected_expiry:
+                # waits for a new token, retrying can't help
+                self.killed.wait(self.poll_interval)
+                continue
+            if ks_expiry != scheduled_expiry:
+                # picked once per token, so every check aims at the same moment
+                offset = uniform(self.margin, self.margin + self.jitter)
+                scheduled_expiry = ks_expiry
+            wait = ks_expiry - offset - time()
+            if wait > 0:
+                self.killed.wait(min(wait, self.poll_interval))
+                continue
+            try:
+                # the plugin might be logging in at the same moment
+                with open_auth_lock(addon):
+                    if token_store.get("ksexpiry") != ks_expiry:
+                        continue  # refreshed by the plugin in the meantime
+                    refresh_ks_session(prepare_session(), addon)
+                xbmc.log(f"{handle} KS token refreshed", xbmc.LOGDEBUG)
+            except Exception as e:
+                xbmc.log(f"{handle} KS token refresh failed: {e}", xbmc.LOGERROR)
+                if isinstance(e, login.RefreshSessionFailed) and e.code == "500017":
+                    # invalid refresh token, authenticate logs in again
+                    rejected_expiry = ks_expiry
+                else:
+                    self.killed.wait(self.retry_interval)
+
+    def stop(self):
+        self.killed.set()
+
+
+class ServiceMonitor(xbmc.Monitor):
+    """
+    Does the background work the plugin asks for: refreshes the stored
+     channel list (stale-while-revalidate mode of the channel list) and
+     prefetches the next pages of the catalog listings.
+    Also drops the stored settings when they change.
+    """
+
+    def __init__(self, *args, **kwargs):
+        xbmc.Monitor.__init__(self, *args, **kwargs)
+        self.refreshing = threading.Lock()
+
+    def onSettingsChanged(self) -> None:
+        # shared with the plugin's functions, see default.addon
+        addon.invalidate()
+
+    def onNotification(self, sender: str, method: str, data: str) -> None:
+        if sender != addon.getAddonInfo("id"):
+            return
+        if method == "Other.refresh_channels":
+            threading.Thread(target=self.refresh_channels).start()
+        elif method == "Other.prefetch_page":
+            threading.Thread(target=self.prefetch_page, args=(loads(data),)).start()
+
+    def refresh_channels(self) -> None:
+        # one refresh at a time, the rest would fetch the same list
+        if not self.refreshing.acquire(blocking=False):
+            return
+        try:
+            session = prepare_session()
+            authenticate(session, addon)
+            _, changed = update_stored_channel_list(session, addon)
+            xbmc.log(
+                f"{handle} Channel list refreshed, changed: {changed}",
+                xbmc.LOGDEBUG,
+            )
+            # only reload the channel list if it's still on screen
+            folder_path = xbmc.getInfoLabel("Container.FolderPath")
+            if (
+                changed
+                and folder_path.startswith(f"plugin://{addon.getAddonInfo('id')}/")
+                and "action=channel_list" in folder_path
+            ):
+                xbmc.executebuiltin("Container.Refresh")
+        except Exception as e:
+            xbmc.log(f"{handle} Channel list refresh failed: {e}", xbmc.LOGERROR)
+        finally:
+            self.refreshing.release()
+
+    def prefetch_page(self, params: dict) -> None:
+        try:
+            session = prepare_session()
+            authenticate(session, addon)
+            cache = open_response_cache(addon, check_refresh=False)
+            if cache is None:
+                return
+            with cache:
+                get_catalog_page(
+                    session,
+                    params["action"],
+                    params["id"],
+                    params["page"],
+                    cache,
+                    addon,
+                )
+            xbmc.log(
+                f"{handle} Prefetched page {params['page']} of {params['action']}",
+                xbmc.LOGDEBUG,
+            )
+        except Exception as e:
+            xbmc.log(f"{handle} Page prefetch failed: {e}", xbmc.LOGERROR)
+
+
 if __name__ == "__main__":
-    monitor = xbmc.Monitor()
+    monitor = ServiceMonitor()
     player = XBMCPlayer()
     epg_updater = main_service(addon)
+    token_refresher = TokenRefreshThread()
+    token_refresher.start()
     while not monitor.abortRequested():
         if monitor.waitForAbort(1):
             break
     player.stop_keepalive_thread()
+    token_refresher.stop()
+    try:
+        token_refresher.join()
+    except RuntimeError:
+        pass
     xbmc.log(f"{handle} Playback Manager Service stopped", xbmc.LOGINFO)
     if epg_updater and epg_updater.is_alive():
         epg_updater.stop()
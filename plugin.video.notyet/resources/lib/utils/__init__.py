@@ -1,6 +1,9 @@
+from collections import deque
+from concurrent.futures import Executor
 from datetime import datetime
 from hashlib import sha256
 from secrets import token_hex
+from typing import Any, Callable, Iterable, Iterator, Tuple
 
 
 def unix_to_date(unix_time: int) -> str:
@@ -29,3 +32,33 @@ def gen_desktop_udid() -> str:
     hash_value = sha256(f"{key}_{random_key}".encode()).hexdigest()
     udid = hash_value[:16].upper()
     return udid
+
+
+def iter_ordered(
+    executor: Executor, func: Callable, items: Iterable, window: int
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Runs func on every item using the executor and yields the results
+     in the order of the items. At most window calls are in flight or
+     waiting to be consumed at a time, so the memory usage stays bounded.
+    Calls that haven't started yet are cancelled if the consumer stops early.
+
+    :param executor: concurrent.futures.Executor object
+    :param func: The function to call with each item
+    :param items: The items to process
+    :param window: The maximum number of pending calls
+    :return: An iterator of (item, result) tuples
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,103 @@
+import os
+import stat
+import tempfile
+from filecmp import cmp
+from gzip import GzipFile
+from io import TextIOWrapper
+from typing import IO
+
+# read once, os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class AtomicWriter:
+    """
+    Context manager that writes to a temporary file next to the target
+     and moves it into place once the block finishes without errors.
+    Every writer gets its own temporary file, so concurrent writers of the
+     same target don't interfere, the last one to finish wins.
+    Readers either see the old or the new file, never a half-written one.
+    The target keeps its permissions, a new one gets the ones open() would
+     give it (mkstemp creates the temporary file readable only by its owner).
+    If the new content is identical to the existing file, the existing
+     file is left untouched, so its modification time doesn't change.
+    Optionally the content is gzip compressed while it's being written.
+
+    Usage:
+        writer = AtomicWriter(path)
+        with writer as f:
+            f.write(...)
+        if writer.changed:
+            ...
+    """
+
+    def __init__(
+        self, path: str, mode: str = "w", compress: bool = False, **kwargs
+    ) -> None:
+        """
+        :param path: Path of the target file
+        :param mode: File mode to open the temporary file with
+        :param compress: Whether to gzip compress the content
+        :param kwargs: Additional arguments passed to open()
+         (or to TextIOWrapper if compressing in text mode)
+        """
+        self.path = path
+        self.tmp_path = None
+        self.mode = mode
+        self.compress = compress
+        self.kwargs = kwargs
+        self.file = None
+        self.raw_file = None
+        self.changed = False
+
+    def __enter__(self) -> IO:
+        fd, self.tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or None,
+            prefix=os.path.basename(self.path) + ".",
+        )
+        try:
+            if not self.compress:
+                self.file = os.fdopen(fd, self.mode, **self.kwargs)
+                return self.file
+            self.raw_file = os.fdopen(fd, "wb")
+        except Exception:
+            os.close(fd)
+            os.remove(self.tmp_path)
+            raise
+        # no file name and a fixed mtime in the header, so the same
+        # content always results in the same compressed file
+        compressed = GzipFile(filename="", mode="wb", fileobj=self.raw_file, mtime=0)
+        if "b" in self.mode:
+            self.file = compressed
+        else:
+            self.file = TextIOWrapper(compressed, **self.kwargs)
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.changed = False
+        try:
+            self.file.close()
+            if self.raw_file:
+                # GzipFile doesn't close the file object it was given
+                self.raw_file.close()
+            if exc_type is None and not (
+                os.path.exists(self.path)
+                and cmp(self.tmp_path, self.path, shallow=False)
+            ):
+                os.chmod(self.tmp_path, self._target_mode())
+                os.replace(self.tmp_path, self.path)
+                self.changed = True
+        finally:
+            # nothing to move into place on errors or unchanged content
+            if not self.changed:
+                try:
+                    os.remove(self.tmp_path)
+                except OSError:
+                    pass
+
+    def _target_mode(self) -> int:
+        try:
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+        except OSError:
+            return 0o666 & ~_UMASK
@@ -0,0 +1,229 @@
+import sqlite3
+import threading
+from json import dumps, loads
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class EPGStore:
+    """
+    Persistent program guide storage backed by SQLite. Programs are stored
+     as JSON documents, indexed by program id, channel id and start/end time.
+    Small values about the stored guide (ie. when it was last fully refreshed)
+     are kept along with it.
+    A single instance can be shared between threads.
+    """
+
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS programmes (
+            id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            data TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS programmes_channel_start ON programmes (channel_id, start)",
+        "CREATE INDEX IF NOT EXISTS programmes_end ON programmes (end)",
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens (or creates) the store.
+
+        :param path: Path of the database file
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        try:
+            # lets the plugin read while the service is writing
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass  # not supported on some file systems, the default works too
+        with self.lock, self.connection:
+            for statement in self.schema:
+                self.connection.execute(statement)
+
+    def __enter__(self) -> "EPGStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the underlying database connection.
+
+        :return: None
+        """
+        with self.lock:
+            self.connection.close()
+
+    def replace(
+        self, channel_id: int, ranges: List[Tuple[int, int]], programmes: Iterable
+    ) -> None:
+        """
+        Replaces the stored programs of a channel that start and end within
+         any of the given ranges with the given programs.
+
+        :param channel_id: The linear asset id of the channel
+        :param ranges: list of (start date, end date) tuples (UNIX timestamps)
+        :param programmes: The new program objects
+        :return: None
+        """
+        rows = [
+            (
+                programme["id"],
+                channel_id,
+                programme.get("startDate", 0),
+                programme.get("endDate", 0),
+                dumps(programme, separators=(",", ":")),
+            )
+            for programme in programmes
+            if programme.get("id")
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM programmes WHERE channel_id = ? AND start >= ? AND end <= ?",
+                [(channel_id, start, end) for start, end in ranges],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO programmes (id, channel_id, start, end, data) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_meta(self, name: str, default: Any = None) -> Any:
+        """
+        Returns a stored value about the guide.
+
+        :param name: The name of the value
+        :param default: Returned if the value isn't stored (optional)
+        :return: The value
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE name = ?", (name,)
+            ).fetchone()
+        return loads(row[0]) if row else default
+
+    def set_meta(self, name: str, value: Any) -> None:
+        """
+        Stores a value about the guide.
+
+        :param name: The name of the value
+        :param value: The value, has to be JSON serializable
+        :return: None
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                (name, dumps(value)),
+            )
+
+    def get_guide(self, channel_id: int, start: int, end: int) -> List[dict]:
+        """
+        Returns the programs of a channel that start and end between
+         two timestamps.
+
+        :param channel_id: The linear asset id of the channel
+        :param start: Start date (UNIX timestamp)
+        :param end: End date (UNIX timestamp)
+        :return: A list of program objects ordered by start date
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT data FROM programmes WHERE channel_id = ? AND start >= ? AND end <= ? ORDER BY start",
+                (channel_id, start, end),
+            ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def get_programme(self, programme_id: int) -> Optional[dict]:
+        """
+        Returns a single program by id.
+
+        :param programme_id: The program id
+        :return: The program object or None if it isn't stored
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM programmes WHERE id = ?", (programme_id,)
+            ).fetchone()
+        return loads(row[0]) if row else None
+
+    def get_airing(self, channel_id: int, at: int) -> Optional[dict]:
+        """
+        Returns the program that is on a channel at a given time.
+
+        :param channel_id: The linear asset id of the channel
+        :param at: UNIX timestamp
+        :return: The program object or None if unknown
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM programmes WHERE channel_id = ? AND start <= ? AND end > ? ORDER BY start DESC LIMIT 1",
+                (channel_id, at, at),
+            ).fetchone()
+        return loads(row[0]) if row else None
+
+    def get_all_airing(self, at: int) -> Dict[int, dict]:
+        """
+        Returns the programs that are on all channels at a given time.
+
+        :param at: UNIX timestamp
+        :return: A dict where the key is the channel id and the value is the program object
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT channel_id, data FROM programmes WHERE start <= ? AND end > ?",
+                (at, at),
+            ).fetchall()
+        return {channel_id: loads(data) for channel_id, data in rows}
+
+    def get_last_end(self, channel_id: int) -> Optional[int]:
+        """
+        Returns the end date of the last stored program of a channel.
+
+        :param channel_id: The linear asset id of the channel
+        :return: UNIX timestamp or None if the channel has no programs stored
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT MAX(end) FROM programmes WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        return row[0]
+
+    def retain_channels(self, channel_ids: Iterable) -> None:
+        """
+        Deletes the programs of every channel that isn't in the given list.
+
+        :param channel_ids: The ids of the channels to keep
+        :return: None
+        """
+        channel_ids = set(channel_ids)
+        with self.lock, self.connection:
+            stored = {
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT DISTINCT channel_id FROM programmes"
+                )
+            }
+            self.connection.executemany(
+                "DELETE FROM programmes WHERE channel_id = ?",
+                [(channel_id,) for channel_id in stored - channel_ids],
+            )
+
+    def purge(self, before: int) -> None:
+        """
+        Deletes the programs that ended before a given time.
+
+        :param before: UNIX timestamp
+        :return: None
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM programmes WHERE end < ?", (before,))
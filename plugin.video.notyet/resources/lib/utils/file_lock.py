@@ -0,0 +1,99 @@
+import os
+from time import sleep, time
+from uuid import uuid4
+
+
+class FileLock:
+    """
+    Lock shared between processes (and threads), held by whoever created
+     the lock file. Waiting gives up after a timeout, so a stuck holder
+     can't block the others forever, and the lock file of a holder that
+     crashed is removed once it's old enough.
+    The lock file holds a token unique to the holder, so a holder whose
+     lock was taken over as stale doesn't remove the new holder's file.
+
+    Usage:
+        with FileLock(path) as acquired:
+            ...
+    """
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 30,
+        stale_after: float = 120,
+        poll_interval: float = 0.1,
+    ) -> None:
+        """
+        :param path: Path of the lock file
+        :param timeout: Seconds to wait for the lock
+        :param stale_after: Seconds after which a lock file is considered
+         to be left behind
+        :param poll_interval: Seconds between the tries
+        """
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.acquired = False
+        self.token = f"{os.getpid()}:{uuid4().hex}"
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+    def acquire(self) -> bool:
+        """
+        Waits for the lock.
+
+        :return: True if the lock was acquired, False if the wait timed out
+        """
+        deadline = time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                try:
+                    os.write(fd, self.token.encode())
+                finally:
+                    os.close(fd)
+                self.acquired = True
+                return True
+            try:
+                # read first, so a lock taken in the meantime isn't removed
+                owner = self._owner()
+                if time() - os.path.getmtime(self.path) > self.stale_after:
+                    self._remove(owner)
+                    continue
+            except OSError:
+                continue  # released in the meantime
+            if time() >= deadline:
+                return False
+            sleep(self.poll_interval)
+
+    def _owner(self) -> str:
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def _remove(self, owner: str) -> None:
+        # removes the lock file only if it still belongs to the owner
+        try:
+            if self._owner() == owner:
+                os.remove(self.path)
+        except OSError:
+            pass
+
+    def release(self) -> None:
+        """
+        Releases the lock if it's still held.
+
+        :return: None
+        """
+        if not self.acquired:
+            return
+        self.acquired = False
+        self._remove(self.token)
@@ -0,0 +1,169 @@
+import threading
+from json import dump, load
+from time import time
+from typing import Any, Callable, Dict, Optional
+
+from .atomic import AtomicWriter
+from .file_lock import FileLock
+
+
+class ReferenceCache:
+    """
+    Cache of near-static reference data (ie. the device brands) in a JSON
+     file. Fresh entries are served as they are. Once an entry expires, it's
+     still served, but it's revalidated in a background thread, so callers
+     only wait for the API if there's nothing stored (or it's too old).
+    Values have to be JSON serializable.
+    Writes re-read the file under a lock file and merge into it, so the
+     processes sharing the file don't drop each other's entries.
+    A single instance can be shared between threads.
+
+    Usage:
+        cache = ReferenceCache(path)
+        brands = cache.get("brands", lambda: get_device_brands(...))
+    """
+
+    # seconds until the entries expire
+    ttls = {
+        "brands": 7 * 24 * 60 * 60,
+        "oauth": 24 * 60 * 60,
+        # refreshed by the service, see default.update_stored_channel_list
+        "channels": 10 * 60,
+        "default": 24 * 60 * 60,
+    }
+    # seconds after which an expired entry isn't served anymore
+    max_age = 30 * 24 * 60 * 60
+
+    def __init__(
+        self, path: str, namespace: str = "", ttls: Dict[str, int] = None
+    ) -> None:
+        """
+        Opens (or creates) the cache.
+
+        :param path: Path of the JSON file
+        :param namespace: Entries stored under another namespace are dropped,
+         ie. to keep the data of different accounts apart
+        :param ttls: Overrides of the expiry times per entry
+        """
+        self.path = path
+        self.namespace = namespace
+        self.ttls = dict(self.ttls, **(ttls or {}))
+        self.lock = threading.Lock()
+        self.revalidating = set()
+        self.entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = load(f)
+            if stored.get("namespace") == self.namespace:
+                return stored.get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            pass  # missing or corrupt, starts over
+        return {}
+
+    def _update(self, change: Callable[[Dict[str, dict]], None]) -> None:
+        # the lock is taken anyway if it's left behind by a stuck process
+        with self.lock, FileLock(f"{self.path}.lock", timeout=5):
+            entries = self._load()
+            change(entries)
+            with AtomicWriter(self.path, encoding="utf-8") as f:
+                dump({"namespace": self.namespace, "entries": entries}, f)
+            self.entries = entries
+
+    def lookup(self, name: str, fetch: Callable[[], Any] = None) -> Optional[Any]:
+        """
+        Returns a stored value without waiting for the API. If it has
+         expired and fetch is given, it's revalidated in the background.
+
+        :param name: The name of the entry
+        :param fetch: Function returning the current value (optional)
+        :return: The stored value or None if there's nothing to serve
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry is None:
+            return None
+        age = time() - entry["created"]
+        if age > self.max_age:
+            return None
+        if fetch is not None and age > self.ttls.get(name, self.ttls["default"]):
+            self.revalidate(name, fetch)
+        return entry["value"]
+
+    def is_fresh(self, name: str) -> bool:
+        """
+        Tells whether an entry is stored and hasn't expired yet.
+
+        :param name: The name of the entry
+        :return: True if the entry is fresh
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+        return entry is not None and time() - entry["created"] <= self.ttls.get(
+            name, self.ttls["default"]
+        )
+
+    def get(self, name: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Returns a stored value or fetches and stores it if there's nothing
+         to serve. Expired values are revalidated in the background.
+
+        :param name: The name of the entry
+        :param fetch: Function returning the current value
+        :return: The value
+        """
+        value = self.lookup(name, fetch)
+        if value is None:
+            value = fetch()
+            self.set(name, value)
+        return value
+
+    def set(self, name: str, value: Any) -> None:
+        """
+        Stores a value.
+
+        :param name: The name of the entry
+        :param value: The value
+        :return: None
+        """
+        entry = {"created": int(time()), "value": value}
+        self._update(lambda entries: entries.update({name: entry}))
+
+    def revalidate(self, name: str, fetch: Callable[[], Any]) -> None:
+        """
+        Fetches and stores a value in a background thread, unless it's
+         being revalidated already. The thread isn't a daemon, so the
+         process waits for it before it exits.
+
+        :param name: The name of the entry
+        :param fetch: Function returning the current value
+        :return: None
+        """
+        with self.lock:
+            if name in self.revalidating:
+                return
+            self.revalidating.add(name)
+
+        def run() -> None:
+            try:
+                self.set(name, fetch())
+            except Exception:
+                pass  # the old value is served until the next try
+            finally:
+                with self.lock:
+                    self.revalidating.discard(name)
+
+        threading.Thread(target=run).start()
+
+    def invalidate(self, name: str = None) -> None:
+        """
+        Deletes an entry or every entry.
+
+        :param name: The name of the entry (optional)
+        :return: None
+        """
+        if name is None:
+            self._update(lambda entries: entries.clear())
+        else:
+            self._update(lambda entries: entries.pop(name, None))
@@ -0,0 +1,240 @@
+import sqlite3
+import threading
+from hashlib import sha1
+from json import dumps, loads
+from time import time
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Persistent cache of list endpoint responses backed by SQLite. Responses
+     are keyed by the normalised filter, the page and the response profile,
+     and expire after a time that depends on what kind of list they hold.
+    When the cache grows over its size limit, the least recently used
+     responses are evicted.
+    A single instance can be shared between threads.
+    """
+
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            created INTEGER NOT NULL,
+            accessed INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            data TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+    )
+    # seconds until the responses of an endpoint class expire
+    ttls = {
+        "channels": 24 * 60 * 60,
+        "catalogue": 60 * 60,
+        "series": 60 * 60,
+        "epg": 10 * 60,
+        "recordings": 2 * 60,
+        "default": 5 * 60,
+    }
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 20 * 1024 * 1024,
+        bypass: bool = False,
+        namespace: str = "",
+        ttls: Dict[str, int] = None,
+    ) -> None:
+        """
+        Opens (or creates) the cache.
+
+        :param path: Path of the database file
+        :param max_size: Maximum total size of the stored responses in bytes
+        :param bypass: Whether to ignore the stored responses (new responses
+         are still stored, replacing the old ones)
+        :param namespace: Mixed into every key, ie. to keep the responses
+         of different accounts apart
+        :param ttls: Overrides of the expiry times per endpoint class
+        """
+        self.max_size = max_size
+        self.bypass = bypass
+        self.namespace = namespace
+        self.ttls = dict(self.ttls, **(ttls or {}))
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        try:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass  # not supported on some file systems, the default works too
+        with self.lock, self.connection:
+            for statement in self.schema:
+                self.connection.execute(statement)
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the underlying database connection.
+
+        :return: None
+        """
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def endpoint_class(filter_obj: dict) -> str:
+        """
+        Tells what kind of list a filter object requests.
+
+        :param filter_obj: The filter object
+        :return: The name of the endpoint class
+        """
+        ksql = filter_obj.get("kSql", "").replace(" ", "")
+        if "asset_type='recording'" in ksql:
+            return "recordings"
+        if "asset_type='epg'" in ksql:
+            return "epg"
+        if "asset_type='613'" in ksql:
+            return "channels"
+        if "SeriesId=" in ksql:
+            return "series"
+        if filter_obj.get("objectType", "").endswith("ChannelFilter"):
+            return "catalogue"
+        return "default"
+
+    def make_key(
+        self,
+        filter_obj: dict,
+        page_idx: int,
+        page_size: int,
+        response_profile: Optional[dict] = None,
+    ) -> str:
+        """
+        Builds the cache key of a request. Filters that only differ in
+         whitespace or key order share the same key.
+
+        :param filter_obj: The filter object
+        :param page_idx: The page index
+        :param page_size: The page size
+        :param response_profile: The response profile (optional)
+        :return: The key
+        """
+        normalised = dict(filter_obj)
+        if "kSql" in normalised:
+            normalised["kSql"] = " ".join(normalised["kSql"].split())
+        return sha1(
+            dumps(
+                [
+                    self.namespace,
+                    normalised,
+                    page_idx,
+                    page_size,
+                    response_profile,
+                ],
+                sort_keys=True,
+                separators=(",", ":"),
+            ).encode()
+        ).hexdigest()
+
+    def get(
+        self,
+        filter_obj: dict,
+        page_idx: int,
+        page_size: int,
+        response_profile: Optional[dict] = None,
+    ) -> Optional[Tuple[list, int]]:
+        """
+        Returns a stored response if it hasn't expired yet.
+
+        :param filter_obj: The filter object
+        :param page_idx: The page index
+        :param page_size: The page size
+        :param response_profile: The response profile (optional)
+        :return: A tuple containing the list of media items and the total
+         number of items or None if there is no fresh response stored
+        """
+        if self.bypass:
+            return None
+        key = self.make_key(filter_obj, page_idx, page_size, response_profile)
+        ttl = self.ttls[self.endpoint_class(filter_obj)]
+        now = int(time())
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT data FROM responses WHERE key = ? AND created > ?",
+                (key, now - ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+        objects, total_count = loads(row[0])
+        return objects, total_count
+
+    def set(
+        self,
+        filter_obj: dict,
+        page_idx: int,
+        page_size: int,
+        response_profile: Optional[dict],
+        objects: list,
+        total_count: int,
+    ) -> None:
+        """
+        Stores a response and evicts the least recently used ones
+         if the cache grew over its size limit.
+
+        :param filter_obj: The filter object
+        :param page_idx: The page index
+        :param page_size: The page size
+        :param response_profile: The response profile (optional)
+        :param objects: The list of media items
+        :param total_count: The total number of items
+        :return: None
+        """
+        key = self.make_key(filter_obj, page_idx, page_size, response_profile)
+        data = dumps([objects, total_count], separators=(",", ":"))
+        if len(data) > self.max_size:
+            return
+        now = int(time())
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, created, accessed, size, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.endpoint_class(filter_obj), now, now, len(data), data),
+            )
+            total = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total <= self.max_size:
+                return
+            for old_key, size in self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed, created"
+            ).fetchall():
+                if total <= self.max_size:
+                    break
+                self.connection.execute(
+                    "DELETE FROM responses WHERE key = ?", (old_key,)
+                )
+                total -= size
+
+    def invalidate(self, endpoint: str = None) -> None:
+        """
+        Deletes the stored responses of an endpoint class or every
+         stored response.
+
+        :param endpoint: The name of the endpoint class (optional)
+        :return: None
+        """
+        with self.lock, self.connection:
+            if endpoint is None:
+                self.connection.execute("DELETE FROM responses")
+            else:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE endpoint = ?", (endpoint,)
+                )
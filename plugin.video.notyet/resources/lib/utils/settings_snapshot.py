@@ -0,0 +1,96 @@
+import threading
+from typing import Any, Dict, Tuple
+
+import xbmcaddon
+
+
+class SettingsSnapshot:
+    """
+    Wraps an xbmcaddon.Addon and keeps the settings, the localized strings
+     and the addon info it read, so each of them crosses into Kodi only once.
+    Settings written through the snapshot are updated in it too. Settings
+     changed by another process are only seen after invalidate(), ie. from
+     xbmc.Monitor.onSettingsChanged in long running scripts.
+    Everything else is passed to the wrapped addon.
+    A single instance can be shared between threads.
+
+    Usage:
+        addon = SettingsSnapshot(xbmcaddon.Addon())
+        addon.getSetting("kstoken")
+    """
+
+    def __init__(self, addon: xbmcaddon.Addon) -> None:
+        """
+        :param addon: The addon to read the values from
+        """
+        self.addon = addon
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, Any], Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.addon, name)
+
+    def _read(self, getter: str, id: Any) -> Any:
+        key = (getter, id)
+        values = self.values
+        if key in values:
+            return values[key]
+        value = getattr(self.addon, getter)(id)
+        with self.lock:
+            # a value written in the meantime wins
+            return values.setdefault(key, value)
+
+    def _write(self, setter: str, getter: str, id: str, value: Any) -> None:
+        getattr(self.addon, setter)(id, value)
+        with self.lock:
+            # the other getters of the setting have to convert the new value
+            for key in [
+                key
+                for key in self.values
+                if key[1] == id and key[0].startswith("getSetting")
+            ]:
+                del self.values[key]
+            self.values[(getter, id)] = value
+
+    def invalidate(self) -> None:
+        """
+        Drops every stored value, the next reads fetch them from Kodi.
+
+        :return: None
+        """
+        with self.lock:
+            self.values = {}
+
+    def getAddonInfo(self, id: str) -> str:
+        return self._read("getAddonInfo", id)
+
+    def getLocalizedString(self, id: int) -> str:
+        return self._read("getLocalizedString", id)
+
+    def getSetting(self, id: str) -> str:
+        return self._read("getSetting", id)
+
+    def getSettingBool(self, id: str) -> bool:
+        return self._read("getSettingBool", id)
+
+    def getSettingInt(self, id: str) -> int:
+        return self._read("getSettingInt", id)
+
+    def getSettingString(self, id: str) -> str:
+        return self._read("getSettingString", id)
+
+    def setSetting(self, id: str, value: str) -> None:
+        self._write("setSetting", "getSetting", id, value)
+
+    def setSettingBool(self, id: str, value: bool) -> None:
+        self._write("setSettingBool", "getSettingBool", id, value)
+
+    def setSettingInt(self, id: str, value: int) -> None:
+        self._write("setSettingInt", "getSettingInt", id, value)
+
+    def setSettingString(self, id: str, value: str) -> None:
+        self._write("setSettingString", "getSettingString", id, value)
+
+    def openSettings(self) -> None:
+        self.addon.openSettings()
+        self.invalidate()
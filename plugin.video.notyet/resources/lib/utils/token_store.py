@@ -0,0 +1,96 @@
+import os
+import threading
+from json import dump, load
+from typing import Any, Dict
+
+from .atomic import AtomicWriter
+
+
+class TokenStore:
+    """
+    Session state (the OAuth and KS tokens and their expiry times) in a single
+     JSON file, with an in-memory mirror.
+    Updates are written at once and atomically. The file is read again only
+     if another process replaced it, which costs a stat per read.
+    A single instance can be shared between threads.
+
+    Usage:
+        store = TokenStore(path)
+        store.update(kstoken=ks_token, ksexpiry=ks_expiry)
+        store.get("kstoken")
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path of the JSON file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, Any] = {}
+        # identifies the version of the file the mirror holds
+        self.version = None
+
+    def _stat(self) -> Any:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _reload(self) -> None:
+        version = self._stat()
+        if version == self.version:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                tokens = load(f)
+            if not isinstance(tokens, dict):
+                tokens = {}
+        except (OSError, ValueError):
+            tokens = {}  # missing or corrupt, starts over
+        self.tokens, self.version = tokens, version
+
+    def get(self, name: str, default: Any = "") -> Any:
+        """
+        Returns a stored value.
+
+        :param name: The name of the value (ie. kstoken)
+        :param default: Returned if the value isn't stored (optional)
+        :return: The value
+        """
+        with self.lock:
+            self._reload()
+            return self.tokens.get(name, default)
+
+    def update(self, **values: Any) -> None:
+        """
+        Stores values and writes the file once. None removes a value.
+
+        :param values: The values by name
+        :return: None
+        """
+        with self.lock:
+            self._reload()
+            tokens = dict(self.tokens, **values)
+            tokens = {
+                name: value for name, value in tokens.items() if value is not None
+            }
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with AtomicWriter(self.path, encoding="utf-8") as f:
+                dump(tokens, f)
+            self.tokens, self.version = tokens, self._stat()
+
+    def clear(self) -> None:
+        """
+        Deletes every stored value.
+
+        :return: None
+        """
+        with self.lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.tokens, self.version = {}, None
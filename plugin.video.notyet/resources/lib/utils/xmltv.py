@@ -0,0 +1,216 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, TextIO
+from xml.sax.saxutils import quoteattr
+
+import xmltodict  # type: ignore
+
+
+class XMLTVWriter:
+    """
+    Writes an XMLTV document element by element, so the whole
+     guide never has to be kept in memory.
+
+    Usage:
+        with XMLTVWriter(f) as writer:
+            writer.write_channel({...})
+            writer.write_programme({...})
+    """
+
+    def __init__(
+        self,
+        output: TextIO,
+        generator_name: str = "plugin.video.notyet",
+        generator_url: str = "",
+    ) -> None:
+        """
+        :param output: A text file object to write the document to
+        :param generator_name: Value of the generator-info-name attribute
+        :param generator_url: Value of the generator-info-url attribute
+        """
+        self.output = output
+        self.generator_name = generator_name
+        self.generator_url = generator_url
+
+    def __enter__(self) -> "XMLTVWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # only close the root element if everything went fine,
+        # a broken document is discarded by the caller anyway
+        if exc_type is None:
+            self.end()
+
+    def start(self) -> None:
+        """
+        Writes the XML declaration and opens the root element.
+
+        :return: None
+        """
+        self.output.write(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            f"<tv generator-info-name={quoteattr(self.generator_name)}"
+            f" generator-info-url={quoteattr(self.generator_url)}>"
+        )
+
+    def end(self) -> None:
+        """
+        Closes the root element.
+
+        :return: None
+        """
+        self.output.write("</tv>")
+
+    def write_element(self, name: str, element: dict) -> None:
+        """
+        Serializes a single element to the output.
+
+        :param name: The tag name
+        :param element: The element in xmltodict's format
+        :return: None
+        """
+        xmltodict.unparse({name: element}, output=self.output, full_document=False)
+
+    def write_channel(self, channel: dict) -> None:
+        """
+        Writes a channel element.
+
+        :param channel: The channel in xmltodict's format
+        :return: None
+        """
+        self.write_element("channel", channel)
+
+    def write_programme(self, programme: dict) -> None:
+        """
+        Writes a programme element.
+
+        :param programme: The programme in xmltodict's format
+        :return: None
+        """
+        self.write_element("programme", programme)
+
+
+class ProgrammeConverter:
+    """
+    Converts the program objects of the API to XMLTV programme elements.
+    Meant to be reused for a whole export: formatted timestamps are
+     memoized, as the end of a program is usually the start of the next one
+     and every program of a day shares the same date part.
+
+    Usage:
+        converter = ProgrammeConverter(epg_in_description)
+        for programme in converter.convert(channel_id, programs):
+            writer.write_programme(programme)
+    """
+
+    # metas used by the export, everything else is skipped
+    metas = ("ContentType", "Year", "SeasonNumber", "EpisodeNumber", "EpisodeName")
+
+    def __init__(
+        self,
+        epg_in_description: bool = False,
+        lang: str = "hu",
+        addon_id: str = "plugin.video.notyet",
+    ) -> None:
+        """
+        :param epg_in_description: Whether to prefix the description with
+         the program id (and a "!" if catchup isn't available)
+        :param lang: Value of the lang attribute of the text elements
+        :param addon_id: The id of the addon handling the catchup urls
+        """
+        self.epg_in_description = epg_in_description
+        self.lang = lang
+        self.catchup_url = (
+            f"plugin://{addon_id}/?action=catchup&id={{}}&start={{}}&end={{}}"
+        )
+        self._times: Dict[int, str] = {}
+        self._days: Dict[int, str] = {}
+
+    def format_time(self, unix_time: int) -> str:
+        """
+        Converts a unix timestamp to the XMLTV time format (in UTC).
+
+        :param unix_time: Unix time
+        :return: XMLTV time format
+        """
+        formatted = self._times.get(unix_time)
+        if formatted is None:
+            day, seconds = divmod(int(unix_time), 86400)
+            date = self._days.get(day)
+            if date is None:
+                date = self._days[day] = datetime.utcfromtimestamp(
+                    day * 86400
+                ).strftime("%Y%m%d")
+            hours, seconds = divmod(seconds, 3600)
+            minutes, seconds = divmod(seconds, 60)
+            # the trailing space is what strftime's %z leaves for naive times
+            formatted = self._times[unix_time] = (
+                f"{date}{hours:02}{minutes:02}{seconds:02} "
+            )
+        return formatted
+
+    def convert(self, channel_id: int, programs: Iterable[dict]) -> List[dict]:
+        """
+        Converts the programs of a channel to programme elements.
+
+        :param channel_id: The linear asset id of the channel
+        :param programs: The program objects
+        :return: A list of programmes in xmltodict's format
+        """
+        format_time = self.format_time
+        lang = self.lang
+        wanted = self.metas
+        programmes = []
+        for program in programs:
+            get = program.get
+            start = get("startDate", 0)
+            end = get("endDate", 0)
+            program_id = get("id")
+            enable_cdvr = get("enableCdvr", True)
+            description = get("description", "")
+            if self.epg_in_description and program_id:
+                description = (
+                    f"({'' if enable_cdvr else '!'}{program_id}) {description}"
+                )
+            image = ""
+            images = get("images")
+            if images:
+                selected = images[0]
+                for candidate in images:
+                    if candidate.get("ratio") == "16x9":
+                        selected = candidate
+                        break
+                image = selected["url"] + "/width/240"
+            values = {
+                key: meta.get("value")
+                for key, meta in get("metas", {}).items()
+                if key in wanted
+            }
+            programme = {
+                "@start": format_time(start),
+                "@stop": format_time(end),
+                "@channel": channel_id,
+                "title": {"@lang": lang, "#text": get("name", "")},
+                "desc": {"@lang": lang, "#text": description},
+                "icon": {"@src": image},
+                "category": values.get("ContentType") or "Unknown",
+            }
+            year = values.get("Year")
+            if year:
+                programme["date"] = year
+            season = values.get("SeasonNumber")
+            episode = values.get("EpisodeNumber")
+            if season and episode:
+                programme["episode-num"] = {
+                    "@system": "xmltv_ns",
+                    "#text": f"{int(season) - 1}.{int(episode) - 1}.",
+                }
+            episode_name = values.get("EpisodeName")
+            if episode_name:
+                programme["sub-title"] = {"@lang": lang, "#text": episode_name}
+            if enable_cdvr:
+                programme["@catchup-id"] = self.catchup_url.format(
+                    program_id, start, end
+                )
+            programmes.append(programme)
+        return programmes
@@ -0,0 +1,217 @@
+from concurrent.futures import Future
+from typing import Any, List, Tuple, Type
+
+from requests import Session
+
+from . import static
+
+
+class YetiError(Exception):
+    """Base class for the errors returned by the Yeti API"""
+
+    def __init__(self, message: str, code: int = 0) -> None:
+        super().__init__(f"{message} (code: {code})")
+        self.message = message
+        self.code = code
+
+
+class SessionExpired(YetiError):
+    """Raised when the ks token has expired"""
+
+    pass
+
+
+# exception types of the error codes that don't depend on the called ep
+error_types = {
+    "500016": SessionExpired,  # KSExpired
+}
+
+
+def raise_for_error(result: Any, error_type: Type[YetiError] = YetiError) -> None:
+    """
+    Raises the error object of a result as an exception. The exception type
+     is looked up by the error code, unless a more specific one is given.
+
+    :param result: The result of a request
+    :param error_type: The exception type to raise (optional)
+    :return: None
+    """
+    if not isinstance(result, dict) or not result.get("error"):
+        return
+    error = result["error"]
+    code = error.get("code", 0)
+    if error_type is YetiError:
+        error_type = error_types.get(str(code), YetiError)
+    raise error_type(error.get("message", ""), code)
+
+
+class YetiClient:
+    """
+    Client of the Yeti OTT API. It owns the session, the base URL and the
+     parameters sent with every request, decodes every response once and
+     raises the error objects of the results as exceptions.
+
+    Usage:
+        client = YetiClient(session, ks_token)
+        household = client.call("household", "get")
+    """
+
+    def __init__(
+        self, _session: Session, ks_token: str = None, base_url: str = None, **kwargs
+    ) -> None:
+        """
+        :param _session: requests.Session object
+        :param ks_token: The ks token (optional, ie. for an anonymous login)
+        :param base_url: The base URL of the API (optional)
+        :param kwargs: Optional arguments (ie. api_version: str, client_tag: str,
+         language: str), unknown ones are ignored
+        """
+        self._session = _session
+        self.ks_token = ks_token
+        self.base_url = base_url or static.get_ott_base()
+        self.api_version = kwargs.get("api_version", static.api_version)
+        self.client_tag = kwargs.get("client_tag", static.app_version_with_build)
+        self.language = kwargs.get("language", "hun")
+
+    def post(self, path: str, data: dict, params: dict = None) -> Any:
+        """
+        Posts a request to a service of the API as is.
+
+        :param path: The path of the ep relative to api_v3/service/
+        :param data: The request body
+        :param params: The query parameters (optional)
+        :return: The result of the response
+        """
+        response = self._session.post(
+            f"{self.base_url}api_v3/service/{path}", params=params, json=data
+        )
+        return response.json().get("result")
+
+    def call(
+        self,
+        service: str,
+        action: str,
+        data: dict = None,
+        error_type: Type[YetiError] = YetiError,
+    ) -> Any:
+        """
+        Calls an action of a service with the common parameters.
+
+        :param service: The name of the service (ie. householddevice)
+        :param action: The name of the action (ie. list)
+        :param data: The parameters of the action, these override
+         the common ones (optional)
+        :param error_type: The exception type to raise when the result
+         is an error (optional)
+        :return: The result of the response
+        """
+        body = {
+            "apiVersion": self.api_version,
+            "clientTag": self.client_tag,
+            "language": self.language,
+        }
+        if self.ks_token:
+            body["ks"] = self.ks_token
+        body.update(data or {})
+        result = self.post(
+            f"{service}/action/{action}",
+            body,
+            static.get_common_params(self.client_tag),
+        )
+        raise_for_error(result, error_type)
+        return result
+
+
+class MultiRequest:
+    """
+    Queues calls of independent actions and sends them to the multirequest
+     ep in a single request. The results are delivered through futures, the
+     error of a single action is raised by the result() of its own future.
+
+    Usage:
+        with MultiRequest(YetiClient(session, ks_token)) as batch:
+            devices = batch.add("householddevice", "list")
+            brands = batch.add("devicebrand", "list")
+        devices.result(), brands.result()
+    """
+
+    def __init__(self, client: YetiClient) -> None:
+        """
+        :param client: The client to send the requests with
+        """
+        self.client = client
+        self.requests: List[Tuple[dict, Type[YetiError], Future]] = []
+
+    def __enter__(self) -> "MultiRequest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.send()
+
+    def add(
+        self,
+        service: str,
+        action: str,
+        data: dict = None,
+        error_type: Type[YetiError] = YetiError,
+    ) -> Future:
+        """
+        Queues a call of an action.
+
+        :param service: The name of the service (ie. householddevice)
+        :param action: The name of the action (ie. list)
+        :param data: The parameters of the action (optional)
+        :param error_type: The exception type to raise when the result
+         is an error (optional)
+        :return: A future of the result
+        """
+        request = {"service": service, "action": action}
+        if self.client.ks_token:
+            request["ks"] = self.client.ks_token
+        request.update(data or {})
+        future = Future()
+        self.requests.append((request, error_type, future))
+        return future
+
+    def send(self) -> None:
+        """
+        Sends the queued calls in a single request and resolves their futures.
+        Raises a YetiError if the whole request failed.
+
+        :return: None
+        """
+        requests, self.requests = self.requests, []
+        if not requests:
+            return
+        data = {
+            str(idx): request for idx, (request, _, _) in enumerate(requests, start=1)
+        }
+        data.update(
+            {
+                "apiVersion": self.client.api_version,
+                "clientTag": self.client.client_tag,
+                "language": self.client.language,
+            }
+        )
+        if self.client.ks_token:
+            data["ks"] = self.client.ks_token
+        results = self.client.post(
+            "multirequest", data, static.get_common_params(self.client.client_tag)
+        )
+        raise_for_error(results)
+        if not isinstance(results, list) or len(results) != len(requests):
+            raise YetiError("Unexpected multirequest response")
+        for (_, error_type, future), result in zip(requests, results):
+            # failed actions are either wrapped in an error object or are
+            # the exception object itself
+            if isinstance(result, dict) and result.get("objectType", "").endswith(
+                "APIException"
+            ):
+                result = {"error": result}
+            try:
+                raise_for_error(result, error_type)
+            except YetiError as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
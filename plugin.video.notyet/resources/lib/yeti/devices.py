@@ -3,14 +3,13 @@ from typing import Tuple
 from requests import Session
 
 from . import static
+from .client import MultiRequest, YetiClient, YetiError
 
 
-class DeviceDeletionError(Exception):
+class DeviceDeletionError(YetiError):
     """Raised when a device deletion fails"""
 
-    def __init__(self, message: str, code: int = 0) -> None:
-        super().__init__(f"{message} (code: {code})")
-        self.code = code
+    pass
 
 
 def get_devices(_session: Session, ks_token: str, **kwargs) -> tuple:
@@ -22,20 +21,8 @@ def get_devices(_session: Session, ks_token: str, **kwargs) -> tuple:
     :param kwargs: Optional arguments
     :return: A tuple containing the devices and the total number of devices
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
-        "ks": ks_token,
-        "language": "hun",
-    }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/householddevice/action/list",
-        params=static.get_common_params(client_tag),
-        json=data,
-    )
-    return response.json()["result"]["objects"], response.json()["result"]["totalCount"]
+    result = YetiClient(_session, ks_token, **kwargs).call("householddevice", "list")
+    return result["objects"], result["totalCount"]
 
 
 def get_device_brands(_session: Session, ks_token: str, **kwargs) -> list:
@@ -47,20 +34,9 @@ def get_device_brands(_session: Session, ks_token: str, **kwargs) -> list:
     :param kwargs: Optional arguments
     :return: A list of device brands
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
-        "ks": ks_token,
-        "language": "hun",
-    }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/devicebrand/action/list",
-        params=static.get_common_params(client_tag),
-        json=data,
-    )
-    return response.json()["result"]["objects"]
+    return YetiClient(_session, ks_token, **kwargs).call("devicebrand", "list")[
+        "objects"
+    ]
 
 
 def delete_device(_session: Session, ks_token: str, ud_id: str, **kwargs) -> list:
@@ -73,28 +49,9 @@ def delete_device(_session: Session, ks_token: str, ud_id: str, **kwargs) -> lis
     :param kwargs: Optional arguments
     :return: A single item list containing the deletion result
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
-        "ks": ks_token,
-        "language": "hun",
-        "udid": ud_id,
-    }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/householddevice/action/delete",
-        params=static.get_common_params(client_tag),
-        json=data,
+    return YetiClient(_session, ks_token, **kwargs).call(
+        "householddevice", "delete", {"udid": ud_id}, DeviceDeletionError
     )
-    if not isinstance(response.json().get("result"), bool) and response.json().get(
-        "result", {}
-    ).get("error"):
-        raise DeviceDeletionError(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    return response.json()["result"]
 
 
 def get_streaming_devices(
@@ -109,23 +66,15 @@ def get_streaming_devices(
     :return: A tuple containing the streaming device list and the
     total number of devices
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
-        "ks": ks_token,
-        "language": "hun",
         "filter": {
             "objectType": f"{static.get_ott_platform_name()}StreamingDeviceFilter"
         },
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/streamingdevice/action/list",
-        params=static.get_common_params(client_tag),
-        json=data,
+    result = YetiClient(_session, ks_token, **kwargs).call(
+        "streamingdevice", "list", data
     )
-    return response.json()["result"]["objects"], response.json()["result"]["totalCount"]
+    return result["objects"], result["totalCount"]
 
 
 def get_brands(_session: Session, ks_token: str, **kwargs) -> dict:
@@ -144,3 +93,39 @@ def get_brands(_session: Session, ks_token: str, **kwargs) -> dict:
         _session, ks_token, api_version=api_version, client_tag=client_tag
     )
     return {brand["id"]: brand["name"] for brand in brands}
+
+
+def get_device_details(
+    _session: Session, ks_token: str, brands: list = None, **kwargs
+) -> Tuple[list, list, list]:
+    """
+    Fetches the devices, the currently streaming devices and the device
+     brands in a single request
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param brands: Previously fetched device brands, these aren't
+     requested again if given (optional)
+    :param kwargs: Optional arguments
+    :return: A tuple containing the devices, the streaming devices
+     and the device brands
+    """
+    with MultiRequest(YetiClient(_session, ks_token, **kwargs)) as batch:
+        devices = batch.add("householddevice", "list")
+        streaming_devices = batch.add(
+            "streamingdevice",
+            "list",
+            {
+                "filter": {
+                    "objectType": f"{static.get_ott_platform_name()}StreamingDeviceFilter"
+                },
+            },
+        )
+        brand_list = batch.add("devicebrand", "list") if brands is None else None
+    if brand_list is not None:
+        brands = brand_list.result()["objects"]
+    return (
+        devices.result()["objects"],
+        streaming_devices.result()["objects"],
+        brands,
+    )
@@ -7,14 +7,13 @@ from requests import Session
 from resources.lib.pkce import generate_pkce_pair
 
 from . import static
+from .client import YetiClient, YetiError
 
 
-class LoginFailed(Exception):
+class LoginFailed(YetiError):
     """Base class for login errors"""
 
-    def __init__(self, message: str, code: int = 0) -> None:
-        super().__init__(f"{message} (code: {code})")
-        self.code = code
+    pass
 
 
 class RefreshSessionFailed(LoginFailed):
@@ -23,7 +22,13 @@ class RefreshSessionFailed(LoginFailed):
     pass
 
 
-class AddHouseHoldDeviceError(Exception):
+class OAuthRefreshFailed(LoginFailed):
+    """Raised when the OAuth access token can't be refreshed"""
+
+    pass
+
+
+class AddHouseHoldDeviceError(YetiError):
     """Raised when adding a household device fails"""
 
     pass
@@ -35,15 +40,15 @@ class DeviceNotRegistered(Exception):
     pass
 
 
-def get_oauth_params(_session: Session, device_id: str, **kwargs) -> Tuple[str, dict]:
+def get_auth_params(_session: Session, device_id: str, **kwargs) -> dict:
     """
-    Get OAuth params for Yeti OAuth login later.
-    Throws AssertionErrors if OAuth details are missing from the response.
+    Get the AUTH_PARAMS object describing Yeti's OAuth portal.
 
     :param _session: requests.Session object
     :param device_id: The device ID
-    :param params: Additional params
-    :return: A tuple containing the device ID and the OAuth params"""
+    :param kwargs: Additional params
+    :return: The AUTH_PARAMS object (or an empty dict if it's missing)
+    """
     version = kwargs.get("app_version", static.app_version)
     client_tag = kwargs.get("client_tag", static.app_version_with_build)
     partner_id = kwargs.get("partner_id", static.partner_id)
@@ -81,7 +86,22 @@ def get_oauth_params(_session: Session, device_id: str, **kwargs) -> Tuple[str,
         },
     )
     json_data = response.json()
-    auth_params = json_data.get("AUTH_PARAMS", {}).get("value")
+    return json_data.get("AUTH_PARAMS", {}).get("value") or {}
+
+
+def get_oauth_params(_session: Session, device_id: str, **kwargs) -> Tuple[str, dict]:
+    """
+    Get OAuth params for Yeti OAuth login later.
+    Throws AssertionErrors if OAuth details are missing from the response.
+
+    :param _session: requests.Session object
+    :param device_id: The device ID
+    :param params: Additional params (ie. auth_params: dict, a previously
+     fetched AUTH_PARAMS object)
+    :return: A tuple containing the device ID and the OAuth params"""
+    auth_params = kwargs.get("auth_params") or get_auth_params(
+        _session, device_id, **kwargs
+    )
     assert auth_params, "AUTH_PARAMS not found in response"
     auth_base = auth_params.get("oauthBaseUrl")
     assert auth_base, "oauthBaseUrl not found in response"
@@ -177,6 +197,54 @@ def login(
     return access_token, refresh_token, expires_in
 
 
+def refresh_oauth_token(
+    _session: Session, device_id: str, refresh_token: str, **kwargs
+) -> Tuple[str, str, int]:
+    """
+    Gets a new OAuth access token with a refresh token, in a single request
+     instead of the whole login.
+    Throws OAuthRefreshFailed if the refresh token is rejected.
+
+    :param _session: requests.Session object
+    :param device_id: The device ID
+    :param refresh_token: The refresh token
+    :param kwargs: Additional params (ie. auth_params: dict, a previously
+     fetched AUTH_PARAMS object)
+    :return: A tuple containing the access token, refresh token
+     and the expiry time in seconds (ie. 3599)
+    """
+    auth_params = kwargs.get("auth_params") or get_auth_params(
+        _session, device_id, **kwargs
+    )
+    client_id = auth_params.get("oAuthClientId")
+    assert client_id, "oAuthClientId not found in response"
+    headers = {
+        "X-Requested-With": "XMLHttpRequest",
+        "X-Device-Id": device_id,
+    }
+    data = {
+        "grant_type": "refresh_token",
+        "client_id": client_id,
+        "refresh_token": refresh_token,
+    }
+    response = _session.post(static.get_access_token_ep(), data=data, headers=headers)
+    try:
+        json_data = response.json()
+    except ValueError:
+        json_data = {}
+    if not response.ok or "access_token" not in json_data:
+        raise OAuthRefreshFailed(
+            json_data.get("error_description", "Failed to refresh the access token"),
+            json_data.get("error", response.status_code),
+        )
+    # the refresh token is only sent again if it's rotated
+    return (
+        json_data["access_token"],
+        json_data.get("refresh_token", refresh_token),
+        json_data["expires_in"],
+    )
+
+
 def anonymous_login(_session: Session, **kwargs) -> Tuple[str, str, str]:
     """
     Login to Yeti anonymously.
@@ -187,25 +255,15 @@ def anonymous_login(_session: Session, **kwargs) -> Tuple[str, str, str]:
     :return: A tuple containing the ks token, refresh token
      and the expiry time in UNIX time
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     partner_id = kwargs.get("partner_id", static.partner_id)
-    params = static.get_common_params(client_tag)
     data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
         "language": "*",
         "partnerId": partner_id,
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/ottuser/action/anonymousLogin",
-        params=params,
-        json=data,
+    result = YetiClient(_session, **kwargs).call(
+        "ottuser", "anonymousLogin", data, LoginFailed
     )
-    ks_token = response.json()["result"]["ks"]
-    refresh_token = response.json()["result"]["refreshToken"]
-    expiry = response.json()["result"]["expiry"]
-    return ks_token, refresh_token, expiry
+    return result["ks"], result["refreshToken"], result["expiry"]
 
 
 def login_ott(
@@ -223,15 +281,10 @@ def login_ott(
     :return: A tuple containing the access token, refresh token
      and the expiry time in UNIX time
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     partner_id = kwargs.get("partner_id", static.partner_id)
     ott_password = kwargs.get("ott_password", static.ott_password)
     ott_username = kwargs.get("ott_username", static.ott_username)
-    params = static.get_common_params(client_tag)
     data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
         "extraParams": {
             "accessToken": {
                 "objectType": f"{static.get_ott_platform_name()}StringValue",
@@ -242,27 +295,15 @@ def login_ott(
                 "value": "accessToken",
             },
         },
-        "ks": ks_token,
-        "language": "hun",
         "partnerId": partner_id,
         "password": ott_password,
         "udid": ud_id,
         "username": ott_username,
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/ottuser/action/login",
-        params=params,
-        json=data,
-    )
-    if response.json().get("result", {}).get("error"):
-        raise LoginFailed(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    ks_token = response.json()["result"]["loginSession"]["ks"]
-    refresh_token = response.json()["result"]["loginSession"]["refreshToken"]
-    expiry = response.json()["result"]["loginSession"]["expiry"]
-    return ks_token, refresh_token, expiry
+    login_session = YetiClient(_session, ks_token, **kwargs).call(
+        "ottuser", "login", data, LoginFailed
+    )["loginSession"]
+    return login_session["ks"], login_session["refreshToken"], login_session["expiry"]
 
 
 def get_household_device(_session: Session, ks_token: str, **kwargs) -> str:
@@ -275,26 +316,13 @@ def get_household_device(_session: Session, ks_token: str, **kwargs) -> str:
     :param kwargs: Additional params
     :return: The device ID
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    params = static.get_common_params(client_tag)
-    data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
-        "ks": ks_token,
-        "language": "hun",
-    }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/householddevice/action/get",
-        params=params,
-        json=data,
-    )
-    if (
-        response.json().get("result", {}).get("error", {}).get("message")
-        == "DeviceNotExists"
-    ):
-        raise DeviceNotRegistered()
-    return response.json()["result"]["udid"]
+    try:
+        result = YetiClient(_session, ks_token, **kwargs).call("householddevice", "get")
+    except YetiError as e:
+        if e.message == "DeviceNotExists":
+            raise DeviceNotRegistered()
+        raise
+    return result["udid"]
 
 
 def add_device_to_household(
@@ -312,33 +340,21 @@ def add_device_to_household(
     :return: The device ID
     """
     name = kwargs.get("name", "")
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     device_brand = kwargs.get("device_brand", static.device_brand)
-    params = static.get_common_params(client_tag)
     data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
         "device": {
             "objectType": f"{static.get_ott_platform_name()}HouseholdDevice",
             "udid": ud_id,
             "name": name,
             "brandId": device_brand,
         },
-        "ks": ks_token,
-        "language": "hun",
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/householddevice/action/add",
-        params=params,
-        json=data,
+    result = YetiClient(_session, ks_token, **kwargs).call(
+        "householddevice", "add", data, AddHouseHoldDeviceError
     )
-    if response.json().get("result", {}).get("state") == "activated":
-        return response.json()["result"]["udid"]
-    else:
-        raise AddHouseHoldDeviceError(
-            response.json()["result"]["error"]["message"],
-        )
+    if result.get("state") != "activated":
+        raise AddHouseHoldDeviceError(f"Device state: {result.get('state')}")
+    return result["udid"]
 
 
 def get_or_add_device_to_household(
@@ -378,29 +394,12 @@ def refresh_ks_token(
     # https://github.com/kaltura/playkit-android/blob/035df79917fdae4a9feb453335974a3ff2c0ca5b/playkit/src/main/java/com/kaltura/playkit/backend/phoenix/services/OttUserService.java#L56-L74
     # but mostly guesswork
     ud_id = kwargs.get("ud_id", None)
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    params = static.get_common_params(client_tag)
     data = {
-        "apiVersion": api_version,
-        "clientTag": client_tag,
         "refreshToken": refresh_token,
-        "ks": ks_token,
-        "language": "hun",
     }
     if ud_id:
         data["udid"] = ud_id
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/ottuser/action/refreshSession",
-        params=params,
-        json=data,
+    result = YetiClient(_session, ks_token, **kwargs).call(
+        "ottuser", "refreshSession", data, RefreshSessionFailed
     )
-    if response.json().get("result", {}).get("error"):
-        raise RefreshSessionFailed(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    ks_token = response.json()["result"]["ks"]
-    refresh_token = response.json()["result"]["refreshToken"]
-    expiry = response.json()["result"]["expiry"]
-    return ks_token, refresh_token, expiry
+    return result["ks"], result["refreshToken"], result["expiry"]
@@ -1,8 +1,11 @@
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from requests import Session
+from resources.lib.utils import iter_ordered
 
 from . import static
+from .client import YetiClient
 
 
 def filter(
@@ -10,47 +13,145 @@ def filter(
 ) -> Tuple[list, int]:
     """
     Calls the list ep with a provided filter object.
+    Raises a YetiError if the result is an error.
 
     :param _session: requests.Session object
     :param filter_obj: The filter object
     :param ks_token: The ks token
     :param page_idx: The page index
-    :param kwargs: Optional arguments (ie. response_profile: dict, page_size: int = 500)
+    :param kwargs: Optional arguments (ie. response_profile: dict, page_size: int = 500,
+     response_cache: ResponseCache)
     :return: A tuple containing the list of media items and the total number of items
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    page_size = kwargs.get("page_size", 500)
-    params = static.get_common_params(client_tag)
+    page_size = kwargs.get("page_size", static.max_page_size)
+    response_profile = kwargs.get("response_profile")
+    response_cache = kwargs.get("response_cache")
+    if response_cache is not None:
+        cached = response_cache.get(filter_obj, page_idx, page_size, response_profile)
+        if cached is not None:
+            return cached
     data = {
-        "language": "hun",
-        "ks": ks_token,
         "filter": filter_obj,
         "pager": {
             "objectType": f"{static.get_ott_platform_name()}FilterPager",
             "pageSize": page_size,
             "pageIndex": page_idx,
         },
-        "clientTag": client_tag,
-        "apiVersion": api_version,
     }
-    response_profile = kwargs.get("response_profile")
     if response_profile:
         data["responseProfile"] = response_profile
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/asset/action/list",
-        params=params,
-        json=data,
-    )
-    total_count = response.json().get("result", {}).get("totalCount", 0)
-    if total_count == 0:
-        return [], 0
-    return response.json()["result"]["objects"], total_count
+    result = YetiClient(_session, ks_token, **kwargs).call("asset", "list", data) or {}
+    total_count = result.get("totalCount", 0)
+    objects = result["objects"] if total_count else []
+    if response_cache is not None:
+        response_cache.set(
+            filter_obj, page_idx, page_size, response_profile, objects, total_count
+        )
+    return objects, total_count
 
 
-def get_channel_list(
-    _session: Session, ks_token: str, keep_official: bool = True, **kwargs
+def adaptive_page_size(total_count: int, page_size: int, max_workers: int) -> int:
+    """
+    Picks the page size the rest of a list is requested with, so the
+     remaining pages fit in a single round of concurrent requests.
+    The size is a multiple of the first page's size, so the pages stay
+     aligned with it, and it's capped at the largest page the API serves.
+
+    :param total_count: The total number of items
+    :param page_size: The size of the first page
+    :param max_workers: The maximum number of pages requested at once
+    :return: The page size
+    """
+    size = -(-total_count // max(1, max_workers))
+    size = -(-size // page_size) * page_size
+    return max(page_size, min(size, static.max_page_size // page_size * page_size))
+
+
+def iter_filter(
+    _session: Session,
+    filter_obj: dict,
+    ks_token: str,
+    max_workers: int = 4,
+    adaptive: bool = False,
+    **kwargs,
+) -> Iterator[dict]:
+    """
+    Calls the list ep with a provided filter object and yields the items
+     of every page as soon as the page arrives. The first response tells
+     the total number of items, the remaining pages are then requested
+     concurrently, but at most max_workers pages are held at a time.
+    In adaptive mode the remaining items are requested with larger pages
+     (see adaptive_page_size), so long lists cost a couple of round trips
+     instead of one per small page.
+
+    :param _session: requests.Session object
+    :param filter_obj: The filter object
+    :param ks_token: The ks token
+    :param max_workers: The maximum number of pages requested at once
+    :param adaptive: Whether to enlarge the pages after the first one
+    :param kwargs: Optional arguments passed to filter (ie. page_size: int = 500)
+    :return: An iterator of media items in the order of the pages
+    """
+    page_size = kwargs.get("page_size", static.max_page_size)
+    page, total_count = filter(_session, filter_obj, ks_token, 1, **kwargs)
+    yield from page
+    count = len(page)
+    if not page or count >= total_count:
+        return
+    first_page_idx, skip = 2, 0
+    if adaptive:
+        size = adaptive_page_size(total_count, page_size, max_workers)
+        if size > page_size:
+            # the first larger page starts with the items we already have
+            first_page_idx, skip = 1, page_size
+            page_size = size
+            kwargs = dict(kwargs, page_size=page_size)
+    page_count = -(-total_count // page_size)
+
+    def get_page(page_idx: int) -> list:
+        page = filter(_session, filter_obj, ks_token, page_idx, **kwargs)[0]
+        return page[skip:] if page_idx == 1 else page
+
+    page_indexes = range(first_page_idx, page_count + 1)
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(page_indexes)))
+    ) as executor:
+        for _, page in iter_ordered(executor, get_page, page_indexes, max_workers):
+            count += len(page)
+            yield from page
+    # the list might have grown since the first page, get the rest one by one
+    page_idx = page_count
+    while page and count < total_count:
+        page_idx += 1
+        page, total_count = filter(_session, filter_obj, ks_token, page_idx, **kwargs)
+        count += len(page)
+        yield from page
+
+
+def filter_all(
+    _session: Session,
+    filter_obj: dict,
+    ks_token: str,
+    max_workers: int = 4,
+    **kwargs,
 ) -> list:
+    """
+    Calls the list ep with a provided filter object and returns the items
+     of every page. See iter_filter.
+
+    :param _session: requests.Session object
+    :param filter_obj: The filter object
+    :param ks_token: The ks token
+    :param max_workers: The maximum number of pages requested at once
+    :param kwargs: Optional arguments passed to filter (ie. page_size: int = 500)
+    :return: A list of media items in the order of the pages
+    """
+    return list(iter_filter(_session, filter_obj, ks_token, max_workers, **kwargs))
+
+
+def iter_channel_list(
+    _session: Session, ks_token: str, keep_official: bool = True, **kwargs
+) -> Iterator[dict]:
     """
     Fetches the live channel list from the API
 
@@ -59,7 +160,7 @@ def get_channel_list(
     :param keep_official: Whether to send the official query or not
     :param kwargs: Optional arguments
     (official includes the channels that are not available for the user)
-    :return: A list of channels
+    :return: An iterator of channels
     """
     ksql_addition = ""
     if not keep_official:
@@ -72,19 +173,26 @@ def get_channel_list(
         # but it filters out the channels that are not available for the user
         "objectType": f"{static.get_ott_platform_name()}SearchAssetFilter",
     }
-    # request all channels in 500 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(_session, filter_obj, ks_token, page_idx, **kwargs)
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
-        page_idx += 1
-    return objects
+    return iter_filter(_session, filter_obj, ks_token, **kwargs)
 
 
-def get_recording_groups(_session: Session, ks_token: str, **kwargs) -> list:
+def get_channel_list(
+    _session: Session, ks_token: str, keep_official: bool = True, **kwargs
+) -> list:
+    """
+    Fetches the live channel list from the API
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param keep_official: Whether to send the official query or not
+    :param kwargs: Optional arguments
+    (official includes the channels that are not available for the user)
+    :return: A list of channels
+    """
+    return list(iter_channel_list(_session, ks_token, keep_official, **kwargs))
+
+
+def iter_recording_groups(_session: Session, ks_token: str, **kwargs) -> Iterator[dict]:
     """
     Fetches the recorded title groups from the API. If its a series,
      it will only return the whole series.
@@ -92,7 +200,7 @@ def get_recording_groups(_session: Session, ks_token: str, **kwargs) -> list:
     :param _session: requests.Session object
     :param ks_token: The ks token
     :param kwargs: Optional arguments
-    :return: A list of recording groups
+    :return: An iterator of recording groups
     """
     filter_obj = {
         "groupBy": [
@@ -118,29 +226,32 @@ def get_recording_groups(_session: Session, ks_token: str, **kwargs) -> list:
             }
         ],
     }
-    # request all recordings in 20 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(
-            _session,
-            filter_obj,
-            ks_token,
-            page_idx,
-            page_size=20,
-            response_profile=response_profile,
-            **kwargs,
-        )
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
-        page_idx += 1
-    return objects
+    kwargs.setdefault("page_size", static.page_size)
+    return iter_filter(
+        _session,
+        filter_obj,
+        ks_token,
+        response_profile=response_profile,
+        **kwargs,
+    )
 
 
-def get_recording_titles(
+def get_recording_groups(_session: Session, ks_token: str, **kwargs) -> list:
+    """
+    Fetches the recorded title groups from the API. If its a series,
+     it will only return the whole series.
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param kwargs: Optional arguments
+    :return: A list of recording groups
+    """
+    return list(iter_recording_groups(_session, ks_token, **kwargs))
+
+
+def iter_recording_titles(
     _session: Session, ks_token: str, media_id: int, **kwargs
-) -> list:
+) -> Iterator[dict]:
     """
     Fetches the recorded titles from the API. Used for series.
 
@@ -148,7 +259,7 @@ def get_recording_titles(
     :param ks_token: The ks token
     :param media_id: The media id
     :param kwargs: Optional arguments
-    :return: A list of recorded titles
+    :return: An iterator of recorded titles
     """
     filter_obj = {
         "kSql": f"(and SeriesId='{media_id}' (and asset_type='recording' start_date <'0' end_date < '0'))",
@@ -171,24 +282,29 @@ def get_recording_titles(
             }
         ],
     }
-    # request all recordings in 20 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(
-            _session,
-            filter_obj,
-            ks_token,
-            page_idx,
-            page_size=20,
-            response_profile=response_profile,
-            **kwargs,
-        )
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
-        page_idx += 1
-    return objects
+    kwargs.setdefault("page_size", static.page_size)
+    return iter_filter(
+        _session,
+        filter_obj,
+        ks_token,
+        response_profile=response_profile,
+        **kwargs,
+    )
+
+
+def get_recording_titles(
+    _session: Session, ks_token: str, media_id: int, **kwargs
+) -> list:
+    """
+    Fetches the recorded titles from the API. Used for series.
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param media_id: The media id
+    :param kwargs: Optional arguments
+    :return: A list of recorded titles
+    """
+    return list(iter_recording_titles(_session, ks_token, media_id, **kwargs))
 
 
 def get_movies_page(
@@ -196,7 +312,7 @@ def get_movies_page(
     ks_token: str,
     movie_id: int,
     page_idx: int,
-    page_size: int = 20,
+    page_size: int = static.page_size,
     **kwargs,
 ) -> list:
     """
@@ -250,7 +366,7 @@ def get_series_page(
     ks_token: str,
     series_id: int,
     page_idx: int,
-    page_size: int = 20,
+    page_size: int = static.page_size,
     **kwargs,
 ) -> list:
     """
@@ -298,9 +414,9 @@ def get_series_page(
     )
 
 
-def get_series_titles(
+def iter_series_titles(
     _session: Session, ks_token: str, series_id: int, **kwargs
-) -> list:
+) -> Iterator[dict]:
     """
     Fetches the series titles from the API
 
@@ -308,7 +424,7 @@ def get_series_titles(
     :param ks_token: The ks token
     :param series_id: The series id
     :param kwargs: Optional arguments
-    :return: A list of series titles
+    :return: An iterator of series titles
     """
     filter_obj = {
         "dynamicOrderBy": {
@@ -333,24 +449,29 @@ def get_series_titles(
         ],
         "retrievedProperties": "assetId, assetType, duration, finishedWatching, position, watchedDate, mediaFiles,description,objectType,name,id,images,tags,metas,epgChannelId,enableCatchUp,enableCdvr,enableStartOver,enableTrickPlay,linearAssetId,type,updateDate,externalId,epgId,endDate,createDate,crid,startDate",
     }
-    # request all recordings in 20 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(
-            _session,
-            filter_obj,
-            ks_token,
-            page_idx,
-            page_size=20,
-            response_profile=response_profile,
-            **kwargs,
-        )
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
-        page_idx += 1
-    return objects
+    kwargs.setdefault("page_size", static.page_size)
+    return iter_filter(
+        _session,
+        filter_obj,
+        ks_token,
+        response_profile=response_profile,
+        **kwargs,
+    )
+
+
+def get_series_titles(
+    _session: Session, ks_token: str, series_id: int, **kwargs
+) -> list:
+    """
+    Fetches the series titles from the API
+
+    :param _session: requests.Session object
+    :param ks_token: The ks token
+    :param series_id: The series id
+    :param kwargs: Optional arguments
+    :return: A list of series titles
+    """
+    return list(iter_series_titles(_session, ks_token, series_id, **kwargs))
 
 
 def get_media_by_id(_session: Session, ks_token: str, media_id: int, **kwargs) -> dict:
@@ -363,14 +484,62 @@ def get_media_by_id(_session: Session, ks_token: str, media_id: int, **kwargs) -
     :param kwargs: optional arguments
     :return: media object or None
     """
-    filter_obj = {
-        "kSql": f"(and media_id:'{media_id}')",
-        "objectType": f"{static.get_ott_platform_name()}SearchAssetFilter",
-    }
-    filtered_objects, _ = filter(
-        _session, filter_obj, ks_token, page_idx=1, page_size=1, **kwargs
+    return get_media_by_ids(_session, ks_token, [media_id], **kwargs).get(str(media_id))
+
+
+def get_media_by_ids(
+    _session: Session, ks_token: str, media_ids: Iterable[int], **kwargs
+) -> Dict[str, dict]:
+    """
+    Looks up many media objects at once, with a single request
+     per 100 ids.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param media_ids: media ids
+    :param kwargs: optional arguments
+    :return: A dict where the key is the media id as a string and the value
+     is the media object, ids that weren't found are missing
+    """
+    kwargs.pop("page_size", None)
+    media_ids = list(dict.fromkeys(str(media_id) for media_id in media_ids))
+    found = {}
+    for idx in range(0, len(media_ids), 100):
+        chunk = media_ids[idx : idx + 100]
+        media_filter = " ".join(f"media_id:'{media_id}'" for media_id in chunk)
+        filter_obj = {
+            "kSql": f"({'or' if len(chunk) > 1 else 'and'} {media_filter})",
+            "objectType": f"{static.get_ott_platform_name()}SearchAssetFilter",
+        }
+        for media in iter_filter(
+            _session, filter_obj, ks_token, page_size=len(chunk), **kwargs
+        ):
+            found[str(media.get("id"))] = media
+    return found
+
+
+def iter_epg_by_linear_asset(
+    _session: Session,
+    ks_token: str,
+    linear_asset_id: int,
+    start_date: int,
+    end_date: int,
+    **kwargs,
+) -> Iterator[dict]:
+    """
+    Grabs the entire program guide for a given linear asset id
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_id: linear asset id
+    :param start_date: start date (UNIX timestamp)
+    :param end_date: end date (UNIX timestamp)
+    :param kwargs: optional arguments
+    :return: iterator of programs ordered by start date
+    """
+    return iter_epg_by_linear_asset_ranges(
+        _session, ks_token, linear_asset_id, [(start_date, end_date)], **kwargs
     )
-    return next(iter(filtered_objects or []), None)
 
 
 def get_epg_by_linear_asset(
@@ -380,7 +549,7 @@ def get_epg_by_linear_asset(
     start_date: int,
     end_date: int,
     **kwargs,
-) -> dict:
+) -> list:
     """
     Grabs the entire program guide for a given linear asset id
 
@@ -390,27 +559,193 @@ def get_epg_by_linear_asset(
     :param start_date: start date (UNIX timestamp)
     :param end_date: end date (UNIX timestamp)
     :param kwargs: optional arguments
-    :return: program guide object
+    :return: list of programs ordered by start date
     """
-    filter_obj = {
-        "kSql": f"(and linear_media_id:'{linear_asset_id}' (and start_date >= '{start_date}' end_date  <= '{end_date}') asset_type='epg' auto_fill= true)",
+    return list(
+        iter_epg_by_linear_asset(
+            _session, ks_token, linear_asset_id, start_date, end_date, **kwargs
+        )
+    )
+
+
+def iter_epg_by_linear_asset_ranges(
+    _session: Session,
+    ks_token: str,
+    linear_asset_id: int,
+    ranges: List[Tuple[int, int]],
+    **kwargs,
+) -> Iterator[dict]:
+    """
+    Grabs the program guide for a given linear asset id in one or more
+     time ranges at once. Programs are included if they start and end
+     within any of the ranges.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_id: linear asset id
+    :param ranges: list of (start date, end date) tuples (UNIX timestamps)
+    :param kwargs: optional arguments
+    :return: iterator of programs ordered by start date
+    """
+    return iter_filter(
+        _session,
+        _epg_filter([linear_asset_id], _ranges_filter(ranges)),
+        ks_token,
+        page_size=static.max_page_size,
+        **kwargs,
+    )
+
+
+def get_epg_by_linear_asset_ranges(
+    _session: Session,
+    ks_token: str,
+    linear_asset_id: int,
+    ranges: List[Tuple[int, int]],
+    **kwargs,
+) -> list:
+    """
+    Grabs the program guide for a given linear asset id in one or more
+     time ranges at once. Programs are included if they start and end
+     within any of the ranges.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_id: linear asset id
+    :param ranges: list of (start date, end date) tuples (UNIX timestamps)
+    :param kwargs: optional arguments
+    :return: list of programs ordered by start date
+    """
+    return list(
+        iter_epg_by_linear_asset_ranges(
+            _session, ks_token, linear_asset_id, ranges, **kwargs
+        )
+    )
+
+
+def get_epg_by_linear_assets(
+    _session: Session,
+    ks_token: str,
+    linear_asset_ids: List[int],
+    ranges: List[Tuple[int, int]],
+    **kwargs,
+) -> Dict[int, list]:
+    """
+    Grabs the program guide of multiple linear assets with a single query
+     in one or more time ranges at once. Programs are included if they start
+     and end within any of the ranges.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_ids: list of linear asset ids
+    :param ranges: list of (start date, end date) tuples (UNIX timestamps)
+    :param kwargs: optional arguments
+    :return: dict where the key is the linear asset id and the value is
+     the list of its programs ordered by start date
+    """
+    return _search_epg(
+        _session, ks_token, linear_asset_ids, _ranges_filter(ranges), **kwargs
+    )
+
+
+def get_epg_slice_by_linear_assets(
+    _session: Session,
+    ks_token: str,
+    linear_asset_ids: List[int],
+    start_date: int,
+    end_date: int,
+    until: int,
+    **kwargs,
+) -> Dict[int, list]:
+    """
+    Grabs one slice of the program guide of multiple linear assets. Programs
+     are included if they start within the slice and end before `until`,
+     so consecutive slices of a window never overlap.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_ids: list of linear asset ids
+    :param start_date: start date of the slice (UNIX timestamp, inclusive)
+    :param end_date: end date of the slice (UNIX timestamp, exclusive)
+    :param until: end date of the whole window (UNIX timestamp)
+    :param kwargs: optional arguments
+    :return: dict where the key is the linear asset id and the value is
+     the list of its programs ordered by start date
+    """
+    date_filter = f"(and start_date >= '{start_date}' start_date < '{end_date}' end_date  <= '{until}')"
+    return _search_epg(_session, ks_token, linear_asset_ids, date_filter, **kwargs)
+
+
+def _ranges_filter(ranges: List[Tuple[int, int]]) -> str:
+    """
+    Builds a kSql expression matching the programs that start and end
+     within any of the given ranges.
+
+    :param ranges: list of (start date, end date) tuples (UNIX timestamps)
+    :return: kSql expression
+    """
+    date_filters = [
+        f"(and start_date >= '{start_date}' end_date  <= '{end_date}')"
+        for start_date, end_date in ranges
+    ]
+    if len(date_filters) > 1:
+        return f"(or {' '.join(date_filters)})"
+    return date_filters[0]
+
+
+def _epg_filter(linear_asset_ids: List[int], date_filter: str) -> dict:
+    """
+    Builds the filter object of a program guide search.
+
+    :param linear_asset_ids: list of linear asset ids
+    :param date_filter: kSql expression filtering the dates
+    :return: The filter object
+    """
+    asset_filters = [
+        f"linear_media_id:'{linear_asset_id}'" for linear_asset_id in linear_asset_ids
+    ]
+    if len(asset_filters) > 1:
+        asset_filter = f"(or {' '.join(asset_filters)})"
+    else:
+        asset_filter = asset_filters[0]
+    return {
+        "kSql": f"(and {asset_filter} {date_filter} asset_type='epg' auto_fill= true)",
         "objectType": f"{static.get_ott_platform_name()}SearchAssetFilter",
         "orderBy": "START_DATE_ASC",
     }
-    # request all recordings in 500 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(
-            _session,
-            filter_obj,
-            ks_token,
-            page_idx,
-            page_size=500,
-            **kwargs,
-        )
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
-        page_idx += 1
-    return objects
+
+
+def _search_epg(
+    _session: Session,
+    ks_token: str,
+    linear_asset_ids: List[int],
+    date_filter: str,
+    **kwargs,
+) -> Dict[int, list]:
+    """
+    Runs a program guide search for multiple linear assets and
+     splits the results back per asset.
+
+    :param _session: requests session object
+    :param ks_token: ks token
+    :param linear_asset_ids: list of linear asset ids
+    :param date_filter: kSql expression filtering the dates
+    :param kwargs: optional arguments
+    :return: dict where the key is the linear asset id and the value is
+     the list of its programs ordered by start date
+    """
+    programs = iter_filter(
+        _session,
+        _epg_filter(linear_asset_ids, date_filter),
+        ks_token,
+        page_size=static.max_page_size,
+        **kwargs,
+    )
+    if len(linear_asset_ids) == 1:
+        return {linear_asset_ids[0]: list(programs)}
+    # split the results back per channel
+    guides = {linear_asset_id: [] for linear_asset_id in linear_asset_ids}
+    for program in programs:
+        guide = guides.get(program.get("linearAssetId"))
+        if guide is not None:
+            guide.append(program)
+    return guides
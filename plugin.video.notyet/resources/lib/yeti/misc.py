@@ -1,14 +1,13 @@
 from requests import Session
 
 from . import static
+from .client import YetiClient, YetiError
 
 
-class RecordingError(Exception):
+class RecordingError(YetiError):
     """Base class for exceptions in this module."""
 
-    def __init__(self, message: str, code: int = 0) -> None:
-        super().__init__(f"{message} (code: {code})")
-        self.code = code
+    pass
 
 
 class RecordingDeletionError(RecordingError):
@@ -33,26 +32,10 @@ def delete_recording(_session: Session, ks_token: str, media_id: int, **kwargs)
     :param kwargs: Optional arguments
     :return: The result of the deletion request
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
-    data = {
-        "language": "hun",
-        "ks": ks_token,
-        "id": media_id,
-        "clientTag": client_tag,
-        "apiVersion": api_version,
-    }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/recording/action/delete",
-        params=static.get_common_params(client_tag),
-        json=data,
+    result = YetiClient(_session, ks_token, **kwargs).call(
+        "recording", "delete", {"id": media_id}, RecordingDeletionError
     )
-    if response.json().get("result", {}).get("error"):
-        raise RecordingDeletionError(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    return response.json()["result"]["status"]
+    return result["status"]
 
 
 def create_single_recording(
@@ -67,29 +50,15 @@ def create_single_recording(
     :param kwargs: Optional arguments
     :return: The result of the recording request
     """
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     data = {
-        "language": "hun",
-        "ks": ks_token,
         "recording": {
             "objectType": f"{static.get_ott_platform_name()}Recording",
             "assetId": media_id,
         },
-        "clientTag": client_tag,
-        "apiVersion": api_version,
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/recording/action/add",
-        params=static.get_common_params(client_tag),
-        json=data,
+    return YetiClient(_session, ks_token, **kwargs).call(
+        "recording", "add", data, RecordingCreationError
     )
-    if response.json().get("result", {}).get("error"):
-        raise RecordingCreationError(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    return response.json()["result"]
 
 
 def create_series_recording(
@@ -108,28 +77,14 @@ def create_series_recording(
     #  145274606, "excludedSeasons": [], "id": 1702530, "seriesId": "1587156", "seriesRecordingOption": {"objectType":
     #  "SeriesRecordingOption", "chronologicalRecordStartTime": "NONE"}, "type": "SERIES", "updateDate": 1689161210}
     # TODO: currently unused
-    api_version = kwargs.get("api_version", static.api_version)
-    client_tag = kwargs.get("client_tag", static.app_version_with_build)
     data = {
-        "language": "hun",
-        "ks": ks_token,
         "recording": {
             "objectType": f"{static.get_ott_platform_name()}SeriesRecording",
             "epgId": media_id,
             "seriesId": series_id,
             "type": "SERIES",
         },
-        "clientTag": client_tag,
-        "apiVersion": api_version,
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/seriesrecording/action/add",
-        params=static.get_common_params(client_tag),
-        json=data,
+    return YetiClient(_session, ks_token, **kwargs).call(
+        "seriesrecording", "add", data, RecordingCreationError
     )
-    if response.json().get("result", {}).get("error"):
-        raise RecordingCreationError(
-            response.json()["result"]["error"]["message"],
-            response.json()["result"]["error"]["code"],
-        )
-    return response.json()["result"]
@@ -1,6 +1,7 @@
 from requests import Session
 
 from . import static
+from .client import YetiClient, raise_for_error
 
 
 def get_playback_obj(_session: Session, ks_token: str, media_id: int, **kwargs) -> dict:
@@ -43,8 +44,6 @@ def get_playback_obj(_session: Session, ks_token: str, media_id: int, **kwargs)
         "ks": ks_token,
         "partnerId": partner_id,
     }
-    response = _session.post(
-        f"{static.get_ott_base()}api_v3/service/multirequest",
-        json=data,
-    )
-    return response.json()["result"]
+    result = YetiClient(_session, ks_token, **kwargs).post("multirequest", data)
+    raise_for_error(result)
+    return result
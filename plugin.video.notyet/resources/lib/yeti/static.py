@@ -24,6 +24,9 @@ channel_type = "613"
 drm_api_version = "7.8.1"
 drm_client_tag = "html5:v7.56"
 movies_id = 357915
+# default size of the listing pages and the largest page the API serves
+page_size = 20
+max_page_size = 500
 
 
 def get_common_params(client_tag: str = None) -> dict: